@@ -1,32 +1,38 @@
 import os
 import sys
 from argparse import ArgumentParser
-from ctypes import windll
 from logging import (DEBUG, INFO, WARNING, FileHandler, Formatter, NullHandler,
                      StreamHandler, getLogger)
-from threading import Thread
-from time import sleep
+from threading import Lock, Thread
+from time import perf_counter_ns, sleep, time
 
-import psutil
-import pygetwindow
-import pythoncom
 import TouchPortalAPI as TP
-import win32process
-from comtypes import COMError
-from pycaw.constants import AudioSessionState
-from pycaw.magic import MagicManager, MagicSession
-from pycaw.pycaw import EDataFlow, ERole
 
 from audioUtil import audioSwitch
-from audioUtil.audioController import (AudioController, get_process_id,
+from audioUtil.backend import AudioSessionState, EDataFlow, ERole, getBackend
+from audioUtil.defaultDevices import DefaultDeviceTracker
+from audioUtil.deviceNotifier import deviceNotifier
+from audioUtil.endpointVolumeWatcher import EndpointVolumeWatcher
+from audioUtil.fadeEngine import FADE_CURVES, FadeEngine
+from audioUtil.ignoreList import IgnoreList
+from audioUtil.mixerScene import MixerScene, SceneStore, SceneTransition
+from audioUtil.peakMeter import PeakMeterSampler, readPeak
+from audioUtil.processCache import processCache
+from audioUtil.audioController import (AudioController, get_process_ids,
                                        getMasterVolume, muteAndUnMute,
                                        setMasterVolume, volumeChanger,
-                                       setDeviceVolume)
+                                       getDeviceVolume, setDeviceVolume)
+from audioUtil.sessionRegistry import sessionRegistry
+from tpUtil.connectorCoalescer import ConnectorCoalescer
+from tpUtil.connectorRegistry import ConnectorRegistry
+from tpUtil.holdScheduler import ACCELERATION_CURVES, HoldScheduler
+from tpUtil.metrics import Metrics
+from tpUtil.profiler import ProfilingSession
+from tpUtil.stateMirror import StateMirror
+from tpUtil.traceRecorder import TraceRecorder
 from tppEntry import *
 from tppEntry import __version__
 
-sys.coinit_flags = 0
-
 try:
     TPClient = TP.Client(
         pluginId = PLUGIN_ID,  # required ID of this plugin
@@ -40,11 +46,35 @@ except Exception as e:
     sys.exit(f"Could not create TP Client, exiting. Error was:\n{repr(e)}")
 
 g_log = getLogger()
-
-audio_ignore_list = []
+stateMirror = StateMirror(TPClient, window=0.05)  # coalesce state creation and choice lists of session bursts
+appConnectors = ConnectorRegistry(TPClient, stateMirror,
+    f"pc_{TP_PLUGIN_INFO['id']}_{TP_PLUGIN_CONNECTORS['APP control']['id']}|{TP_PLUGIN_CONNECTORS['APP control']['data']['appchoice']['id']}=")
+masterVolumeConnector = appConnectors.handle("Master Volume")
+currentAppConnector = appConnectors.handle("Current app")
+peakConnectors = ConnectorRegistry(TPClient, stateMirror,
+    f"pc_{TP_PLUGIN_INFO['id']}_{TP_PLUGIN_CONNECTORS['APP peak']['id']}|{TP_PLUGIN_CONNECTORS['APP peak']['data']['appchoice']['id']}=")
+connectorCoalescer = ConnectorCoalescer()
+holdScheduler = HoldScheduler()
+metrics = Metrics()
+metrics.watch("outbound messages", lambda: stateMirror.sent)
+metrics.watch("unchanged values dropped", lambda: stateMirror.suppressed)
+metrics.watch("connector changes coalesced", lambda: connectorCoalescer.coalesced)
+fadeEngine = FadeEngine(batch=stateMirror.batch)  # every fade step of a tick goes out in one write
+sceneStore = SceneStore("scenes.json")
+
+audio_ignore_list = IgnoreList()
+audioApps = {}  # app name -> AudioApp
+audioAppsLock = Lock()
 volumeprocess = ["Master Volume", "Current app"]
 running = False
-pythoncom.CoInitialize()
+deviceResyncInterval = 30
+metricsInterval = 0
+metricStates = set()  # names of the metrics that have a state
+tickInterval = 0.5
+backend = getBackend()
+backend.observe_calls(lambda method, ns: metrics.record(f"audio {method}", ns))
+foregroundTracker = backend.foreground()
+endpointVolumes = EndpointVolumeWatcher(backend)
 
 dataMapper = {
             "Output": EDataFlow.eRender.value,
@@ -53,29 +83,77 @@ dataMapper = {
             "Communications": ERole.eCommunications.value
         }
 
+defaultDeviceStates = {
+    (EDataFlow.eRender.value, ERole.eMultimedia.value): TP_PLUGIN_STATES["outputDevice"]["id"],
+    (EDataFlow.eRender.value, ERole.eCommunications.value): TP_PLUGIN_STATES["outputcommicationDevice"]["id"],
+    (EDataFlow.eCapture.value, ERole.eMultimedia.value): TP_PLUGIN_STATES["inputDevice"]["id"],
+    (EDataFlow.eCapture.value, ERole.eCommunications.value): TP_PLUGIN_STATES["inputDeviceCommication"]["id"],
+}
+
+def updateDefaultDeviceState(flow, role, device_id, name):
+    stateMirror.stateUpdate(defaultDeviceStates[(flow, role)], name)
+    if (flow, role) == (EDataFlow.eRender.value, ERole.eMultimedia.value):
+        # master volume follows the default speakers
+        endpointVolumes.bind("master", device_id, flow, updateMasterVolume)
+
+def updateMasterVolume(volume, muted=False):
+    """ Master volume changed, from the endpoint volume callback or the polling fallback """
+    master_volume = int(round(volume * 100))
+    with stateMirror.batch():
+        masterVolumeConnector.update(master_volume)
+        stateMirror.stateUpdate(TP_PLUGIN_STATES["master volume"]["id"], str(master_volume))
+
+defaultDevices = DefaultDeviceTracker(audioSwitch.getDefaultDevice, deviceNotifier, updateDefaultDeviceState,
+                                      audioSwitch.getDeviceName, backend.call)
+for flow, role in defaultDeviceStates:
+    defaultDevices.watch(flow, role)
+
 def updateVolumeMixerChoicelist():
-    TPClient.choiceUpdate(TP_PLUGIN_ACTIONS["Inc/DecrVol"]['data']['AppChoice']['id'], volumeprocess[1:])
-    TPClient.choiceUpdate(TP_PLUGIN_ACTIONS["AppMute"]['data']['appChoice']['id'], volumeprocess[1:])
-    TPClient.choiceUpdate(TP_PLUGIN_CONNECTORS["APP control"]["data"]["appchoice"]['id'], volumeprocess)
-    TPClient.choiceUpdate(TP_PLUGIN_ACTIONS["AppAudioSwitch"]["data"]["AppChoice"]["id"], volumeprocess[1:])
+    stateMirror.choiceUpdate(TP_PLUGIN_ACTIONS["Inc/DecrVol"]['data']['AppChoice']['id'], volumeprocess[1:])
+    stateMirror.choiceUpdate(TP_PLUGIN_ACTIONS["AppMute"]['data']['appChoice']['id'], volumeprocess[1:])
+    stateMirror.choiceUpdate(TP_PLUGIN_CONNECTORS["APP control"]["data"]["appchoice"]['id'], volumeprocess)
+    stateMirror.choiceUpdate(TP_PLUGIN_CONNECTORS["APP peak"]["data"]["appchoice"]['id'], volumeprocess)
+    stateMirror.choiceUpdate(TP_PLUGIN_ACTIONS["AppAudioSwitch"]["data"]["AppChoice"]["id"], volumeprocess[1:])
+    stateMirror.choiceUpdate(TP_PLUGIN_ACTIONS["fadeAppVolume"]["data"]["AppChoice"]["id"], volumeprocess)
+
+def updateAppliedVolume(process, volume):
+    """ Push a volume we just applied so TP doesn't have to wait for the next stateUpdate tick """
+    if volume is None:
+        return
+    if process == "Master Volume":
+        stateMirror.stateUpdate(TP_PLUGIN_STATES["master volume"]["id"], str(volume))
+    elif process == "Current app":
+        stateMirror.stateUpdate(TP_PLUGIN_STATES['currentAppVolume']['id'], str(volume))
+
+def forgetVolume(process):
+    """ A slider was dragged or an action arrived for `process`, its next volume is sent even if it didn't change """
+    if process == "Master Volume":
+        connector, stateId = masterVolumeConnector, TP_PLUGIN_STATES["master volume"]["id"]
+    elif process == "Current app":
+        connector, stateId = currentAppConnector, TP_PLUGIN_STATES['currentAppVolume']['id']
+    else:
+        connector, stateId = appConnectors.handle(process), PLUGIN_ID + f".createState.{process}.volume"
+    connector.forget()
+    stateMirror.forget(stateIds=[stateId])
 
 def removeAudioState(app_name):
     global volumeprocess
-    TPClient.removeStateMany([
+    stateIds = [
             PLUGIN_ID + f".createState.{app_name}.muteState",
             PLUGIN_ID + f".createState.{app_name}.volume",
-            PLUGIN_ID + f".createState.{app_name}.active"
-            ])
+            PLUGIN_ID + f".createState.{app_name}.active",
+            PLUGIN_ID + f".createState.{app_name}.peak"
+            ]
+    stateMirror.removeStates(stateIds)
     volumeprocess.remove(app_name)
     updateVolumeMixerChoicelist() # Update with new changes
 
 def audioStateManager(app_name):
     global volumeprocess
-    g_log.debug(f"AUDIO EXEMPT LIST {audio_ignore_list}")
 
     if app_name not in volumeprocess:
         g_log.info("Creating states")
-        TPClient.createStateMany([
+        stateMirror.createStates([
                 {   
                     "id": PLUGIN_ID + f".createState.{app_name}.muteState",
                     "desc": f"{app_name} Mute State",
@@ -94,6 +172,12 @@ def audioStateManager(app_name):
                     "parentGroup": "Audio process state",
                     "value": ""
                 },
+                {
+                    "id": PLUGIN_ID + f".createState.{app_name}.peak",
+                    "desc": f"{app_name} Peak",
+                    "parentGroup": "Audio process state",
+                    "value": "0"
+                },
                 ])
         volumeprocess.append(app_name)
 
@@ -107,78 +191,126 @@ def audioStateManager(app_name):
         return True
     return False
 
-class WinAudioCallBack(MagicSession):
-    def __init__(self):
-        super().__init__(volume_callback=self.update_volume,
-                         mute_callback=self.update_mute,
-                         state_callback=self.update_state)
+class AudioApp(object):
+    """
+    States of one executable, shared by all of its sessions.
+
+    The app's volume is the loudest of its sessions, it is muted only when all
+    of them are and active when any of them is. Its states exist as long as it
+    has a session.
+    """
+    def __init__(self, app_name):
+        self.app_name = app_name
+        self.listeners = {}  # session key -> WinAudioCallBack
+        self.connector = appConnectors.handle(app_name)
+
+    @property
+    def volume(self):
+        return max((listener.volume for listener in list(self.listeners.values())), default=0.0)
+
+    @property
+    def muted(self):
+        return all(listener.muted for listener in list(self.listeners.values()))
+
+    @property
+    def active(self):
+        return any(listener.state == AudioSessionState.Active for listener in list(self.listeners.values()))
+
+    def peak(self):
+        """ Loudest meter of the app's active sessions, inactive ones are silent and not read """
+        return max((readPeak(listener.session.meter) for listener in list(self.listeners.values())
+                    if listener.state == AudioSessionState.Active), default=0.0)
+
+    def publish(self):
+        """ Create the states of this app and push the current values """
+        if self.app_name not in audio_ignore_list:
+            self.publish_mute()
+            self.publish_state()
+            self.publish_volume()
+
+    def publish_state(self):
+        if self.app_name not in audio_ignore_list:
+            stateMirror.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.active", "True" if self.active else "False")
+
+    def publish_volume(self):
+        if self.app_name not in audio_ignore_list:
+            volume = round(self.volume*100)
+            with stateMirror.batch():
+                stateMirror.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.volume", str(volume))
+                self.connector.update(volume)
+
+                """Checking for Current App If Its Active, Adjust it also"""
+                if os.path.basename(getActiveExecutablePath()) == self.app_name:
+                    currentAppConnector.update(volume)
+
+    def publish_mute(self):
+        if self.app_name not in audio_ignore_list:
+            isDeleted = audioStateManager(self.app_name)
+
+            if not isDeleted:
+                stateMirror.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.muteState", "Muted" if self.muted else "Un-muted")
+
+
+class WinAudioCallBack(object):
+    """ Listener the audio backend creates for every session, see AudioBackend.watch_sessions """
+    def __init__(self, session, volume, mute, state):
+        self.session = session
+        # last values seen, the app's states are worked out from those of all its sessions
+        self.volume = volume
+        self.muted = mute
+        self.state = state
 
         # ______________ DISPLAY NAME ______________
-        self.app_name = self.magic_root_session.app_exec
+        self.app_name = session.name
         #print(f":: new session: {self.app_name}")
-        
-        if self.app_name not in audio_ignore_list:
-            # set initial:
-            self.update_mute(self.mute)
-            self.update_state(self.state)
-            self.update_volume(self.volume)
-        
+        sessionRegistry.add(session)
+        with audioAppsLock:
+            if (app := audioApps.get(self.app_name)) is None:
+                app = audioApps[self.app_name] = AudioApp(self.app_name)
+            app.listeners[session.key] = self
+        self.app = app
+
+        app.publish()
 
     def update_state(self, new_state):
         """
         when status changed
         (see callback -> AudioSessionEvents -> OnStateChanged)
         """
-        
-        if self.app_name not in audio_ignore_list:
-            if new_state == AudioSessionState.Inactive:
-                # AudioSessionStateInactive
-                """Sesssion is Inactive"""
-                g_log.info(f"{self.app_name} not active")
-                TPClient.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.active","False")
-    
-            elif new_state == AudioSessionState.Active:
-                """Session Active"""
-                g_log.info(f"{self.app_name} is an Active Session")
-                TPClient.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.active","True")
-    
+        self.state = new_state
+
         if new_state == AudioSessionState.Expired:
-            """Removing Expired States"""
-            removeAudioState(self.app_name)
+            """Removing Expired States, only once the app's last session is gone"""
+            sessionRegistry.remove(self.session)
+            if not sessionRegistry.sessions_by_pid(self.session.pid):
+                processCache.forget(self.session.pid) # the pid may belong to another process next time
+            with audioAppsLock:
+                self.app.listeners.pop(self.session.key, None)
+                last = not self.app.listeners and audioApps.get(self.app_name) is self.app
+                if last:
+                    del audioApps[self.app_name]
+            if not last:
+                # the app's volume, mute and activity may have come from this session
+                self.app.publish()
+            elif self.app_name in volumeprocess:
+                removeAudioState(self.app_name)
+            return
+
+        g_log.info(f"{self.app_name} is {'an Active Session' if new_state == AudioSessionState.Active else 'not active'}")
+        self.app.publish_state()
 
-    
     def update_volume(self, new_volume):
         """
         when volume is changed externally - Updating Sliders and Volume States
         (see callback -> AudioSessionEvents -> OnSimpleVolumeChanged )
         """
-
-        if self.app_name not in audio_ignore_list:
-            TPClient.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.volume", str(round(new_volume*100)))
-            #print(f"{self.app_name} NEW VOLUME", str(round(new_volume*100)))
-            app_connector_id =f"pc_{TP_PLUGIN_INFO['id']}_{TP_PLUGIN_CONNECTORS['APP control']['id']}|{TP_PLUGIN_CONNECTORS['APP control']['data']['appchoice']['id']}={self.app_name}"
-
-            if app_connector_id in TPClient.shortIdTracker :
-                TPClient.shortIdUpdate(
-                    TPClient.shortIdTracker[app_connector_id],
-                    round(new_volume*100))
-            """Checking for Current App If Its Active, Adjust it also"""
-            if (activeWindow := getActiveExecutablePath()) != "":
-                current_app_connector_id = f"pc_{TP_PLUGIN_INFO['id']}_{TP_PLUGIN_CONNECTORS['APP control']['id']}|{TP_PLUGIN_CONNECTORS['APP control']['data']['appchoice']['id']}=Current app"
-
-                if current_app_connector_id in TPClient.shortIdTracker :
-                    TPClient.shortIdUpdate(
-                        TPClient.shortIdTracker[current_app_connector_id],
-                        int(new_volume*100) if os.path.basename(activeWindow) == self.app_name else 0)
+        self.volume = new_volume
+        self.app.publish_volume()
 
     def update_mute(self, muted):
         """ when mute state is changed by user or through other app """
-        
-        if self.app_name not in audio_ignore_list:
-            isDeleted = audioStateManager(self.app_name)
-
-            if not isDeleted:
-                TPClient.stateUpdate(PLUGIN_ID + f".createState.{self.app_name}.muteState", "Muted" if muted else "Un-muted")
+        self.muted = muted
+        self.app.publish_mute()
 
 def updateDevice(options, choiceId, instanceId=None):
     deviceList = list(audioSwitch.MyAudioUtilities.getAllDevices(options).keys())
@@ -194,110 +326,202 @@ def updateDevice(options, choiceId, instanceId=None):
 
 
 def getActiveExecutablePath():
-    hWnd = windll.user32.GetForegroundWindow()
-    if hWnd == 0:
-        return None # Note that this function doesn't use GetLastError().
+    """ exe path of the foreground window, "" if there is none """
+    if not foregroundTracker.snapshot.hwnd:
+        foregroundTracker.refresh() # tracker not running yet, or nothing had focus last time
+    return foregroundTracker.snapshot.exe
+
+def updateCurrentAppVolume(activeWindow, resync=False):
+    """ Volume of the focused app as its session callbacks keep it in audioApps, read from its sessions when `resync` """
+    name = os.path.basename(activeWindow) if activeWindow else ""
+    if resync:
+        current_app_volume = AudioController(name).process_volume() if name else None
+    else:
+        with audioAppsLock:
+            app = audioApps.get(name)
+        current_app_volume = app.volume if app is not None else None
+    if current_app_volume:
+        currentAppConnector.update(int(current_app_volume*100))
+        stateMirror.stateUpdate(TP_PLUGIN_STATES['currentAppVolume']['id'], str(int(current_app_volume*100)))
     else:
-        _, pid = win32process.GetWindowThreadProcessId(hWnd)
-        return psutil.Process(pid).exe()
+        currentAppConnector.update(0)
+        stateMirror.stateUpdate(TP_PLUGIN_STATES['currentAppVolume']['id'], 0)
 
-import comtypes
+def onForegroundChange(snapshot):
+    """ Called from the foreground tracker as soon as the focused window (or its title) changes """
+    if not running:
+        return
+    with stateMirror.batch():
+        stateMirror.stateUpdate(TP_PLUGIN_STATES['FocusedAPP']['id'], snapshot.title)
+        updateCurrentAppVolume(snapshot.exe)
 
-STGM_READ = 0x00000000
 def getDevicebydata(edata, erole):
-    DEVPKEY_Device_FriendlyName = "{a45c254e-df1c-4efd-8020-67d146a850e0} 14".upper()
-
-    device = ""
-    audioDevice = None
-
-    comtypes.CoInitialize()
-    try:
-        audioDevice = audioSwitch.MyAudioUtilities.GetDeviceState(edata, erole)
-        if audioDevice:
-            properties = {}
-            store = audioDevice.OpenPropertyStore(STGM_READ)
-            try:
-                propCount = store.GetCount()
-                for j in range(propCount):
-                    pk = store.GetAt(j)
-                    value = store.GetValue(pk)
-                    v = value.GetValue()
-                    value.clear()
-
-                    name = str(pk)
-                    properties[name] = v
-                device = properties.get(DEVPKEY_Device_FriendlyName, "")
-
-            finally:
-                value.clear()
-                store.Release()
-                del store
-                del properties
-
-    except COMError as exc:
-        pass
+    """ friendly name of the default device for `edata`/`erole` """
+    return audioSwitch.getDefaultDevice(edata, erole)[1]
+
+def getDefaultDeviceId(edata, erole):
+    """ id of the default device for `edata`/`erole`, from the tracker when it knows it """
+    if (device := defaultDevices.get(edata, erole)) is not None:
+        return device[0]
+    return audioSwitch.getDefaultDevice(edata, erole)[0]
+
+def cycleDevice(direction, deviceNames, role):
+    """
+    Make the device after the current default in `deviceNames` the default,
+    every active device of `direction` when the list is empty. Names and the
+    current default come from caches, only the switch itself is an audio call.
+    """
+    devices = audioSwitch.MyAudioUtilities.getAllDevices(direction)
+    deviceIds = [devices[name] for name in deviceNames if name in devices] if deviceNames else list(devices.values())
+    if (deviceId := audioSwitch.nextDevice(deviceIds, getDefaultDeviceId(dataMapper[direction], dataMapper[role]))):
+        switchDefaultDevice(direction, deviceId, role)
+
+def switchDefaultDevice(direction, deviceId, role):
+    """ Make `deviceId` the default and update the tracker right away, a quick second press already cycles from it """
+    audioSwitch.switchOutput(deviceId, dataMapper[role])
+    defaultDevices.changed(dataMapper[direction], dataMapper[role], deviceId)
+
+
+def metricStateId(name):
+    return PLUGIN_ID + ".state.metrics." + "".join(c if c.isalnum() else "_" for c in name)
+
+def publishMetrics():
+    """ One state per latency histogram and counter rate, created the first time the metric shows up """
+    values = metrics.histograms()
+    values.update({f"{name} rate": f"{rate:.1f}/s" for name, rate in metrics.rates().items()})
+    if (new := [name for name in values if name not in metricStates]):
+        stateMirror.createStates([{"id": metricStateId(name), "desc": f"Plugin metrics: {name}",
+                                   "parentGroup": "Plugin metrics", "value": values[name]} for name in new])
+        metricStates.update(new)
+    with stateMirror.batch():
+        for name, value in values.items():
+            stateMirror.stateUpdate(metricStateId(name), value)
+
+def removeMetricStates():
+    stateMirror.removeStates([metricStateId(name) for name in metricStates])
+    metricStates.clear()
+
+peakStates = {
+    EDataFlow.eRender.value: (TP_PLUGIN_STATES["outputPeak"]["id"], "Master Volume"),
+    EDataFlow.eCapture.value: (TP_PLUGIN_STATES["inputPeak"]["id"], None),
+}
+
+def readPeaks():
+    """ Peak of every app and default device, runs on the backend's thread (see PeakMeterSampler) """
+    with audioAppsLock:
+        apps = list(audioApps.values())
+    peaks = {("app", app.app_name): app.peak() for app in apps if app.app_name not in audio_ignore_list}
+    for flow in peakStates:
+        peaks[("device", flow)] = readPeak(backend.endpoint_meter("default", flow))
+    peaks[("current",)] = peaks.get(("app", os.path.basename(foregroundTracker.snapshot.exe)), 0.0)
+    return peaks
+
+def publishPeaks(levels):
+    """ Levels that changed since the last sampling pass, all in one write """
+    with stateMirror.batch():
+        for key, level in levels.items():
+            if key[0] == "app":
+                if key[1] in volumeprocess:  # its states may be gone already
+                    stateMirror.stateUpdate(PLUGIN_ID + f".createState.{key[1]}.peak", str(level))
+                    peakConnectors.handle(key[1]).update(level)
+            elif key[0] == "device":
+                stateId, connector = peakStates[key[1]]
+                stateMirror.stateUpdate(stateId, str(level))
+                if connector:
+                    peakConnectors.handle(connector).update(level)
+            else:
+                peakConnectors.handle("Current app").update(level)
 
-    finally:
-        if audioDevice:
-            audioDevice.Release()
-            del audioDevice
-        comtypes.CoUninitialize()
-    return str(device)
-        
+peakMeters = PeakMeterSampler(readPeaks, publishPeaks, backend=backend)
+metrics.watch("peak meter passes", lambda: peakMeters.passes)
+metrics.watch("peak meter overruns", lambda: peakMeters.overruns)
 
 def stateUpdate():
-    updateSwitch = 1
+    lastDeviceResync = time()
+    lastMetrics = time()
     while running:
-        sleep(0.5)
-        TPClient.stateUpdate(TP_PLUGIN_STATES['FocusedAPP']['id'], pygetwindow.getActiveWindowTitle())
-
-        # Update master volume
-        master_volume = getMasterVolume()
-        master_volume_connector_id = f"pc_{TP_PLUGIN_INFO['id']}_{TP_PLUGIN_CONNECTORS['APP control']['id']}|{TP_PLUGIN_CONNECTORS['APP control']['data']['appchoice']['id']}=Master Volume"
-        if master_volume_connector_id in TPClient.shortIdTracker:
-            TPClient.shortIdUpdate(
-                    TPClient.shortIdTracker[master_volume_connector_id],
-                    master_volume)
-        
-        TPClient.stateUpdate(TP_PLUGIN_STATES["master volume"]["id"], str(master_volume))
-
-        activeWindow = getActiveExecutablePath()
-        current_app_connector_id = f"pc_{TP_PLUGIN_INFO['id']}_{TP_PLUGIN_CONNECTORS['APP control']['id']}|{TP_PLUGIN_CONNECTORS['APP control']['data']['appchoice']['id']}=Current app"
-        if activeWindow != "" and activeWindow != None and (current_app_volume := AudioController(os.path.basename(activeWindow)).process_volume()):
-            if current_app_connector_id in TPClient.shortIdTracker:
-                TPClient.shortIdUpdate(
-                    TPClient.shortIdTracker[current_app_connector_id],
-                    int(current_app_volume*100))
-            TPClient.stateUpdate(TP_PLUGIN_STATES['currentAppVolume']['id'], str(int(current_app_volume*100)))
-        else:
-            if current_app_connector_id in TPClient.shortIdTracker:
-                TPClient.shortIdUpdate(
-                    TPClient.shortIdTracker[current_app_connector_id],
-                    0)
-            TPClient.stateUpdate(TP_PLUGIN_STATES['currentAppVolume']['id'], 0)
-
-        if (updateSwitch == 1):
-            TPClient.stateUpdate(TP_PLUGIN_STATES["outputDevice"]["id"], getDevicebydata(EDataFlow.eRender.value, ERole.eMultimedia.value))
-            updateSwitch = 2
-        elif (updateSwitch == 2):
-            TPClient.stateUpdate(TP_PLUGIN_STATES["outputcommicationDevice"]["id"], getDevicebydata(EDataFlow.eRender.value, ERole.eCommunications.value))
-            updateSwitch = 3
-        elif (updateSwitch == 3):
-            TPClient.stateUpdate(TP_PLUGIN_STATES["inputDevice"]["id"], getDevicebydata(EDataFlow.eCapture.value, ERole.eMultimedia.value))
-            updateSwitch = 4
-        elif (updateSwitch == 4):
-            TPClient.stateUpdate(TP_PLUGIN_STATES["inputDeviceCommication"]["id"], getDevicebydata(EDataFlow.eCapture.value, ERole.eCommunications.value))
-            updateSwitch = 1
-        
-        pythoncom.CoUninitialize()
+        sleep(tickInterval)
+        tickStart = perf_counter_ns()
+
+        # everything that changed during this tick goes out in one write
+        with stateMirror.batch():
+            # master volume is event driven when the backend supports it, polled every tick otherwise
+            if not endpointVolumes.bound("master") or time() - lastDeviceResync >= deviceResyncInterval:
+                updateMasterVolume(getMasterVolume() / 100)
+
+            # the focused app and its volume are event driven, its sessions are only read on the resync interval
+            updateCurrentAppVolume(getActiveExecutablePath(), time() - lastDeviceResync >= deviceResyncInterval)
+
+            # default devices are event driven, this is only a safety net
+            if time() - lastDeviceResync >= deviceResyncInterval:
+                defaultDevices.resync()
+                processCache.prune()
+                lastDeviceResync = time()
+
+        tickTime = perf_counter_ns() - tickStart
+        metrics.record("stateUpdate tick", tickTime)
+        if tickTime > tickInterval * 1e9:
+            metrics.count("stateUpdate overruns")
+
+        if metricsInterval and time() - lastMetrics >= metricsInterval:
+            publishMetrics()
+            lastMetrics = time()
+
+def applyIgnoreList(ignoreList):
+    """ Switch to a new ignore list, removing states of apps it now ignores and bringing back the rest """
+    global audio_ignore_list
+    if ignoreList == audio_ignore_list:
+        return
+    previous, audio_ignore_list = audio_ignore_list, ignoreList
+    g_log.debug(f"AUDIO EXEMPT LIST {audio_ignore_list}")
+
+    with stateMirror.batch():
+        for app in list(audioApps.values()):
+            if app.app_name in ignoreList:
+                if app.app_name in volumeprocess:
+                    removeAudioState(app.app_name)
+            elif app.app_name in previous:
+                app.publish()
 
 def handleSettings(settings, on_connect=False):
-    global audio_ignore_list
+    global deviceResyncInterval, metricsInterval
 
     settings = { list(settings[i])[0] : list(settings[i].values())[0] for i in range(len(settings)) }
 
     if (value := settings.get(TP_PLUGIN_SETTINGS['ignore list']['name'])) is not None:
-        audio_ignore_list = value if value != TP_PLUGIN_SETTINGS['ignore list']['default'] else []
+        applyIgnoreList(IgnoreList.parse(value if value != TP_PLUGIN_SETTINGS['ignore list']['default'] else ""))
+
+    if (value := settings.get(TP_PLUGIN_SETTINGS['device resync']['name'])) is not None:
+        try:
+            deviceResyncInterval = max(1, float(value))
+        except ValueError:
+            g_log.info(f"Invalid default device resync interval: {value}")
+
+    if (value := settings.get(TP_PLUGIN_SETTINGS['hold rate']['name'])) is not None:
+        try:
+            holdScheduler.interval = max(10, float(value)) / 1000
+        except ValueError:
+            g_log.info(f"Invalid hold repeat rate: {value}")
+
+    if (value := settings.get(TP_PLUGIN_SETTINGS['hold acceleration']['name'])) is not None:
+        if value.lower() in ACCELERATION_CURVES:
+            holdScheduler.curve = value.lower()
+        else:
+            g_log.info(f"Unknown hold acceleration: {value}")
+
+    if (value := settings.get(TP_PLUGIN_SETTINGS['metrics interval']['name'])) is not None:
+        try:
+            metricsInterval = max(0, float(value))
+        except ValueError:
+            g_log.info(f"Invalid metrics states interval: {value}")
+        if not metricsInterval and metricStates:
+            removeMetricStates()
+
+    if (value := settings.get(TP_PLUGIN_SETTINGS['peak meter rate']['name'])) is not None:
+        try:
+            peakMeters.set_rate(value)
+        except ValueError:
+            g_log.info(f"Invalid peak meter rate: {value}")
 
 @TPClient.on(TP.TYPES.onConnect)
 def onConnect(data):
@@ -310,19 +534,34 @@ def onConnect(data):
 
     running = True
 
+    try:
+        audioSwitch.startDeviceNotifications()
+    except Exception as e:
+        g_log.info(f"Could not register for audio device notifications: {e}")
+    defaultDevices.start() # also binds the master volume callback to the default speakers
+    foregroundTracker.on_change = onForegroundChange
+    foregroundTracker.start()
+
     run_callback()
     #g_log.debug(f"--------- Magic already in session!! ---------\n------{err}------")
     
     Thread(target=stateUpdate).start()
 
 def run_callback():
-    pythoncom.CoInitialize()
     try:
-        MagicManager.magic_session(WinAudioCallBack)
+        # every session that already exists shows up here, create their states and choices in one go
+        with stateMirror.hold():
+            backend.watch_sessions(WinAudioCallBack)
+        sessionRegistry.resync() # start from the same sessions the backend is watching
     except Exception as e:
         g_log.info(e, exc_info=True)
 
 
+@TPClient.on(TP.TYPES.shortConnectorIdNotification)
+def onShortConnectorId(data):
+    appConnectors.onShortIdNotification(data['connectorId'], data['shortId'])
+    peakConnectors.onShortIdNotification(data['connectorId'], data['shortId'])
+
 # Settings handler
 @TPClient.on(TP.TYPES.onSettingUpdate)
 def onSettingUpdate(data):
@@ -332,6 +571,7 @@ def onSettingUpdate(data):
 
 # Action handler
 @TPClient.on(TP.TYPES.onAction)
+@metrics.timed(lambda data: f"onAction {data.get('actionId', '').rsplit('.act.', 1)[-1]}")
 def onAction(data):
     g_log.debug(f"Action: {data}")
     # check that `data` and `actionId` members exist and save them for later use
@@ -349,45 +589,47 @@ def onAction(data):
             else:
                 muteAndUnMute(action_data[0]['value'], action_data[1]['value'])
     elif actionid == TP_PLUGIN_ACTIONS['Inc/DecrVol']['id']:
+        forgetVolume(action_data[0]['value'])
         volume_value = int(action_data[2]['value'])
         volume_value = max(0, min(volume_value, 100))
 
         if action_data[0]['value'] == "Current app":
             activeWindow = getActiveExecutablePath()
             if activeWindow != "":
-                volumeChanger(os.path.basename(activeWindow), action_data[1]['value'], volume_value)
+                fadeEngine.cancel(appFadeKey(os.path.basename(activeWindow)))
+                updateAppliedVolume("Current app", volumeChanger(os.path.basename(activeWindow), action_data[1]['value'], volume_value))
         else:
-            volumeChanger(action_data[0]['value'], action_data[1]['value'], volume_value)
+            fadeEngine.cancel(appFadeKey(action_data[0]['value']))
+            updateAppliedVolume(action_data[0]['value'], volumeChanger(action_data[0]['value'], action_data[1]['value'], volume_value))
     elif actionid == TP_PLUGIN_ACTIONS["ChangeOut/Input"]["id"] and action_data[0]['value'] != "Pick One": 
         deviceId = audioSwitch.MyAudioUtilities.getAllDevices(action_data[0]['value'])
         deviceId = deviceId.get(action_data[1]['value'])
         if (deviceId):
-            audioSwitch.switchOutput(deviceId, dataMapper[action_data[2]['value']])
+            switchDefaultDevice(action_data[0]['value'], deviceId, action_data[2]['value'])
         # for device in audioSwitch.MyAudioUtilities.getAllDevices(action_data[0]['value']):
         #     if device.FriendlyName == action_data[1]['value']:
         #         audioSwitch.switchOutput(device.id, dataMapper[action_data[2]['value']])
 
     elif actionid == TP_PLUGIN_ACTIONS["ToggleOut/Input"]["id"] and action_data[0]['value'] != "Pick One":
-        deviceId = audioSwitch.MyAudioUtilities.getAllDevices(action_data[0]['value'])
-        currentDeviceId = deviceId.get(getDevicebydata(dataMapper[action_data[0]['value']], dataMapper[action_data[3]['value']]))
-        choiceDeviceId1 = deviceId.get(action_data[1]['value'])
-        choiceDeviceId2 = deviceId.get(action_data[2]['value'])
-        if (choiceDeviceId1 and choiceDeviceId2):
-            if choiceDeviceId1 == currentDeviceId:
-                audioSwitch.switchOutput(choiceDeviceId2, dataMapper[action_data[3]['value']])
-            else:
-                audioSwitch.switchOutput(choiceDeviceId1, dataMapper[action_data[3]['value']])
+        deviceNames = [action_data[1]['value'], action_data[2]['value']]
+        if all(name in audioSwitch.MyAudioUtilities.getAllDevices(action_data[0]['value']) for name in deviceNames):
+            cycleDevice(action_data[0]['value'], deviceNames, action_data[3]['value'])
         # for device in audioSwitch.MyAudioUtilities.getAllDevices(action_data[0]['value']):
         #     if device.FriendlyName == action_data[1]['value']:
         #         audioSwitch.switchOutput(device.id, dataMapper[action_data[2]['value']])
                
+    elif actionid == TP_PLUGIN_ACTIONS["CycleOut/Input"]["id"] and action_data[0]['value'] != "Pick One":
+        deviceNames = [name.strip() for name in action_data[1]['value'].split(",") if name.strip()]
+        cycleDevice(action_data[0]['value'], deviceNames, action_data[2]['value'])
+
     elif actionid == TP_PLUGIN_ACTIONS["AppAudioSwitch"]["id"] and action_data[2]["value"] != "Pick One":
         deviceId = ""
         if (action_data[1]["value"] != "Default"):
             deviceId = audioSwitch.MyAudioUtilities.getAllDevices(action_data[2]["value"])
             deviceId = deviceId.get(action_data[1]["value"])
 
-        if ((processid := get_process_id(action_data[0]['value'])) != None):
+        # every process of the app, a browser or game can play from several
+        for processid in get_process_ids(action_data[0]['value']):
             g_log.info(f"args devId: {deviceId}, processId: {processid}")
             if (deviceId == "" and action_data[1]["value"] == "Default") or deviceId:
                 audioSwitch.SetApplicationEndpoint(deviceId, 1 if action_data[2]["value"] == "Input" else 0, processid)
@@ -404,6 +646,7 @@ def onAction(data):
             except ValueError:
                 return
             
+            fadeEngine.cancel(("device", action_data[0]["value"], device))
             setDeviceVolume(device, action_data[0]["value"], volume)
         # for device in audioSwitch.MyAudioUtilities.getAllDevices(action_data[2]["value"]):
         #     if (deviceId := '' if action_data[1]["value"] == "Default" == 'Default' else device.id if device.FriendlyName == action_data[1]["value"] else None) != None:
@@ -412,34 +655,174 @@ def onAction(data):
                 #     audioSwitch.SetApplicationEndpoint(deviceId, 1 if action_data[2]["value"] == "Input" else 0, processid)
             
 
+    elif actionid == TP_PLUGIN_ACTIONS["fadeAppVolume"]["id"] and action_data[0]['value'] != "":
+        if (arguments := fadeArguments(action_data[1]['value'], action_data[2]['value'], action_data[3]['value'])):
+            fadeApp(action_data[0]['value'], *arguments)
+
+    elif actionid == TP_PLUGIN_ACTIONS["fadeDeviceVolume"]["id"] and action_data[0]["value"] != "Pick One":
+        device = "default"
+        if action_data[1]['value'].lower() != "default":
+            devices = audioSwitch.MyAudioUtilities.getAllDevices(action_data[0]["value"])
+            device = devices.get(action_data[1]['value'], "")
+
+        if device and (arguments := fadeArguments(action_data[2]['value'], action_data[3]['value'], action_data[4]['value'])):
+            fadeDevice(action_data[0]["value"], device, *arguments)
+
+    elif actionid == TP_PLUGIN_ACTIONS["mixerScene"]["id"] and action_data[1]['value'].strip() != "":
+        scene_name = action_data[1]['value'].strip()
+        if action_data[0]['value'] == "Save":
+            sceneStore.save(scene_name, MixerScene.capture(backend))
+        elif action_data[0]['value'] == "Delete":
+            sceneStore.delete(scene_name)
+        else:
+            try:
+                duration = max(0.0, float(action_data[2]['value'])) / 1000
+            except ValueError:
+                duration = 0.0
+            restoreScene(scene_name, duration, action_data[3]['value'].lower())
+
+    elif actionid == TP_PLUGIN_ACTIONS["metrics"]["id"]:
+        if action_data[0]['value'] == "Reset":
+            metrics.reset()
+        else:
+            g_log.info(metrics.format())
+
     else:
         g_log.warning("Got unknown action ID: " + actionid)
 
+def appFadeKey(process):
+    """ Fades are keyed by the app they write to, "Current app" has to be resolved to the focused exe first """
+    return ("device", "Output", "default") if process == "Master Volume" else ("app", process)
+
+def fadeApp(process, volume, duration, curve):
+    """ Fade `process` ("Master Volume", "Current app" or an app name) to `volume` percent over `duration` seconds """
+    if process == "Master Volume":
+        if (start := getDeviceVolume("default", "Output")) is None:
+            return
+        def write(value):
+            setMasterVolume(value * 100)
+            updateAppliedVolume("Master Volume", round(value * 100))
+    else:
+        # "Current app" stays the app that had focus when the fade started
+        if process == "Current app":
+            if (activeWindow := getActiveExecutablePath()) == "":
+                return
+            app_name = os.path.basename(activeWindow)
+        else:
+            app_name = process
+        controller = AudioController(app_name)
+        if (start := controller.process_volume()) is None:
+            return
+        start *= 100
+        def write(value):
+            controller.set_volume(value)
+            if process == "Current app":
+                updateAppliedVolume("Current app", round(value * 100))
+        process = app_name
+    fadeEngine.fade(appFadeKey(process), start / 100, volume / 100, duration, write, curve)
+
+def fadeDevice(direction, device, volume, duration, curve):
+    """ Fade a device ("default" or its id) to `volume` percent over `duration` seconds """
+    if (start := getDeviceVolume(device, direction)) is None:
+        return
+    fadeEngine.fade(("device", direction, device), start / 100, volume / 100, duration,
+                    lambda value: setDeviceVolume(device, direction, value * 100), curve)
+
+def restoreScene(scene_name, duration, curve):
+    """ Apply a saved scene, crossfading every app and device of it together when `duration` is set """
+    if (scene := sceneStore.get(scene_name)) is None:
+        g_log.info(f"No mixer scene named {scene_name}")
+        return
+    transition = SceneTransition(scene, backend)
+
+    # the scene takes over from fades running on its apps and devices
+    for app_name in transition.app_names:
+        fadeEngine.cancel(appFadeKey(app_name))
+    for flow, device_id in transition.device_ids:
+        direction = "Input" if flow == EDataFlow.eCapture.value else "Output"
+        fadeEngine.cancel(("device", direction, device_id))
+        fadeEngine.cancel(("device", direction, "default"))
+
+    if duration > 0:
+        fadeEngine.fade(("scene",), 0.0, 1.0, duration, transition.apply, curve)
+    else:
+        fadeEngine.cancel(("scene",))
+        transition.apply(1.0)
+    stateMirror.stateUpdate(TP_PLUGIN_STATES["mixerScene"]["id"], scene_name)
+
+def fadeArguments(volume, duration, curve):
+    """ (volume percent, duration seconds, curve) from action data, None if they are not numbers """
+    try:
+        volume, duration = max(0, min(float(volume), 100)), max(0.0, float(duration)) / 1000
+    except ValueError:
+        return None
+    if (curve := curve.lower()) not in FADE_CURVES:
+        g_log.info(f"Unknown fade curve: {curve}")
+    return volume, duration, curve
+
+def holdKey(data):
+    """ One key per button: the action id alone would tie together every button of that action """
+    return (data['actionId'], tuple(item['value'] for item in data['data']))
+
+def volumeHoldStep(process, action, value):
+    """ One repeat of a held Inc/DecrVol button, `multiplier` comes from the acceleration curve """
+    def step(multiplier):
+        volume_value = value if action == "Set" else max(0, min(round(value * multiplier), 100))
+        if process == "Current app":
+            if (activeWindow := getActiveExecutablePath()) != "":
+                # the focus can move to another app during the hold
+                fadeEngine.cancel(appFadeKey(os.path.basename(activeWindow)))
+                updateAppliedVolume("Current app", volumeChanger(os.path.basename(activeWindow), action, volume_value))
+        else:
+            updateAppliedVolume(process, volumeChanger(process, action, volume_value))
+    return step
+
 @TPClient.on(TP.TYPES.onHold_down)
+@metrics.timed("heldingButton")
 def heldingButton(data):
     g_log.debug(f"heldingButton: {data}")
-    while True:
-        if TPClient.isActionBeingHeld(TP_PLUGIN_ACTIONS['Inc/DecrVol']['id']):
-            volume_value = int(data['data'][2]['value'])
-            volume_value = max(0, min(volume_value, 100))
-            volumeChanger(data['data'][0]['value'], data['data'][1]['value'], volume_value)
-            sleep(0.05)
-        else:
-            break
+    if data['actionId'] == TP_PLUGIN_ACTIONS['Inc/DecrVol']['id']:
+        forgetVolume(data['data'][0]['value'])
+        volume_value = int(data['data'][2]['value'])
+        volume_value = max(0, min(volume_value, 100))
+        if data['data'][0]['value'] != "Current app":
+            fadeEngine.cancel(appFadeKey(data['data'][0]['value']))
+        elif (activeWindow := getActiveExecutablePath()) != "":
+            fadeEngine.cancel(appFadeKey(os.path.basename(activeWindow)))
+        # the scheduler repeats it until releasedButton releases this button's key, this handler thread is free again right away.
+        # not TPClient.isActionBeingHeld, that is per action: letting go of one button would stop every other one of the action
+        holdScheduler.hold(holdKey(data),
+                           volumeHoldStep(data['data'][0]['value'], data['data'][1]['value'], volume_value),
+                           lambda: running)
+
+@TPClient.on(TP.TYPES.onHold_up)
+def releasedButton(data):
     g_log.debug(f"Not helding button {data}")
+    holdScheduler.release(holdKey(data))
 
 @TPClient.on(TP.TYPES.onConnectorChange)
+@metrics.timed("connectors")
 def connectors(data):
     g_log.info(f"connector Change: {data}")
+    if data['connectorId'] == TP_PLUGIN_CONNECTORS["APP control"]['id']:
+        forgetVolume(data['data'][0]['value'])
+    # a drag sends far more values than can be applied, only the latest one per slider is
+    connectorCoalescer.submit((data['connectorId'],) + tuple(item['value'] for item in data['data']),
+                              data, applyConnectorChange)
+
+def applyConnectorChange(data):
     if data['connectorId'] == TP_PLUGIN_CONNECTORS["APP control"]['id']:
         if data['data'][0]['value'] == "Master Volume":
-            setMasterVolume(data['value'])
+            fadeEngine.cancel(appFadeKey("Master Volume"))
+            updateAppliedVolume("Master Volume", volumeChanger("Master Volume", "Set", data['value']))
         elif data['data'][0]['value'] == "Current app":
             activeWindow = getActiveExecutablePath()
             
             if activeWindow != "":
-                volumeChanger(os.path.basename(activeWindow), "Set", data['value'])
+                fadeEngine.cancel(appFadeKey(os.path.basename(activeWindow)))
+                updateAppliedVolume("Current app", volumeChanger(os.path.basename(activeWindow), "Set", data['value']))
         else:
+            fadeEngine.cancel(appFadeKey(data['data'][0]['value']))
             try:
                 volumeChanger(data['data'][0]['value'], "Set", data['value'])
             except Exception as e:
@@ -447,6 +830,17 @@ def connectors(data):
 
 
 
+    elif data["connectorId"] == TP_PLUGIN_CONNECTORS["APP peak"]["id"]:
+        # display only: forget what was sent last so the next sampling pass puts the meter back
+        choice = data['data'][0]['value']
+        peakConnectors.handle(choice).forget()
+        if choice == "Master Volume":
+            peakMeters.forget(("device", EDataFlow.eRender.value))
+        elif choice == "Current app":
+            peakMeters.forget(("current",))
+        else:
+            peakMeters.forget(("app", choice))
+
     elif data["connectorId"] == TP_PLUGIN_CONNECTORS["Windows Audio"]["id"]:
         device = "default"
         if data['data'][0]['value'].lower() != "default":
@@ -455,9 +849,11 @@ def connectors(data):
 
         if device:
             print(data)
+            fadeEngine.cancel(("device", data['data'][0]['value'], device))
             setDeviceVolume(device, data['data'][0]['value'], data['value'])
 
 @TPClient.on(TP.TYPES.onListChange)
+@metrics.timed("onListChange")
 def onListChange(data):
     g_log.info(f"onlistChange: {data}")
     if data['actionId'] == TP_PLUGIN_ACTIONS["ChangeOut/Input"]['id'] and \
@@ -486,6 +882,13 @@ def onListChange(data):
             updateDevice(data['value'], TP_PLUGIN_ACTIONS["setDeviceVolume"]["data"]["deviceOption"]["id"], data['instanceId'])
         except Exception as e:
             g_log.info("Update device setDeviceVolume error " + str(e))
+
+    elif data['actionId'] == TP_PLUGIN_ACTIONS["fadeDeviceVolume"]["id"] and \
+        data["listId"] == TP_PLUGIN_ACTIONS["fadeDeviceVolume"]["data"]["deviceType"]["id"]:
+        try:
+            updateDevice(data['value'], TP_PLUGIN_ACTIONS["fadeDeviceVolume"]["data"]["deviceOption"]["id"], data['instanceId'])
+        except Exception as e:
+            g_log.info("Update device fadeDeviceVolume error " + str(e))
     
     # elif data['actionId'] == TP_PLUGIN_CONNECTORS["Windows Audio"]["id"] and \
     #     data["listId"] == (listId := TP_PLUGIN_CONNECTORS["Windows Audio"]["data"]["deviceType"]["id"]):
@@ -499,6 +902,13 @@ def onListChange(data):
 @TPClient.on(TP.TYPES.onShutdown)
 def onShutdown(data):
     g_log.info('Received shutdown event from TP Client.')
+    holdScheduler.release_all()
+    fadeEngine.cancel_all()
+    peakMeters.stop()
+    endpointVolumes.stop()
+    g_log.debug(f"Outbound state messages: {stateMirror.stats()}")
+    g_log.debug(f"Connector changes: {connectorCoalescer.stats()}")
+    g_log.debug(metrics.format())
 
 # Error handler
 # @TPClient.on(TP.TYPES.onError)
@@ -520,6 +930,12 @@ def main():
                         help="Log to this file (default is stdout).")
     parser.add_argument("-s", action='store_true',
                         help="If logging to file, also output to stdout.")
+    parser.add_argument("-r", metavar="<tracefile>",
+                        help="Record every message from Touch Portal to this file, for benchmarks.replay.")
+    parser.add_argument("-p", metavar="<dir>",
+                        help="Profile the plugin, writing cProfile and tracemalloc dumps to this directory.")
+    parser.add_argument("--profile-interval", metavar="<seconds>", type=float, default=60.0,
+                        help="How often to write profiling dumps (default 60).")
 
     opts = parser.parse_args()
     del parser
@@ -556,6 +972,15 @@ def main():
             g_log.addHandler(sh)
 
     g_log.info(f"Starting {TP_PLUGIN_INFO['name']} v{__version__} on {sys.platform}.")
+    recorder = None
+    if opts.r:
+        recorder = TraceRecorder(opts.r)
+        TPClient.on(TP.TYPES.allMessage, recorder.record)
+    profiler = None
+    if opts.p:
+        # before connecting, so the client's worker threads and stateUpdate are profiled too
+        profiler = ProfilingSession(opts.p, max(1.0, opts.profile_interval))
+        profiler.start()
     ret = 1
     try:
         # Connect to Touch Portal desktop application.
@@ -573,6 +998,10 @@ def main():
     finally:
         # Make sure TP Client is stopped, this will do nothing if it is already disconnected.
         TPClient.disconnect()
+        if recorder:
+            recorder.close()
+        if profiler:
+            profiler.stop()
 
     # TP disconnected, clean up.
     del TPClient
@@ -1,151 +1,96 @@
-from ctypes import POINTER, cast
-
-import comtypes
-import pythoncom
-from comtypes import CLSCTX_ALL
-from pycaw.constants import CLSID_MMDeviceEnumerator
-from pycaw.pycaw import (AudioUtilities, EDataFlow, IAudioEndpointVolume,
-                         IMMDeviceEnumerator)
+from .backend import EDataFlow, flowFromDirection, getBackend
+from .sessionRegistry import sessionRegistry
 
 
 class AudioController(object):
-    pythoncom.CoInitialize()
     def __init__(self, process_name):
         self.process_name = process_name
-        self.volume = self.process_volume()
+        self.volume = None
 
     def process_volume(self):
-        pythoncom.CoInitialize()  # 3rd coinitilize...
-        sessions = AudioUtilities.GetAllSessions()
-        for session in sessions:
-            interface = session.SimpleAudioVolume
-            if session.Process and session.Process.name() == self.process_name:
-                return interface.GetMasterVolume()
+        if (app := sessionRegistry.app(self.process_name)):
+            self.volume = app.volume()
+            return self.volume
 
     def set_volume(self, decibels):
-        sessions = AudioUtilities.GetAllSessions()
-        for session in sessions:
-            interface = session.SimpleAudioVolume
-            if session.Process and session.Process.name() == self.process_name:
-                # only set volume in the range 0.0 to 1.0
-                self.volume = min(1.0, max(0.0, decibels))
-                interface.SetMasterVolume(self.volume, None)
+        if (app := sessionRegistry.app(self.process_name)):
+            # only set volume in the range 0.0 to 1.0, on every session of the app
+            self.volume = app.set_volume(decibels)
+            return self.volume
 
     def decrease_volume(self, decibels):
-        sessions = AudioUtilities.GetAllSessions()
-        for session in sessions:
-            interface = session.SimpleAudioVolume
-            if session.Process and session.Process.name() == self.process_name:
-                # 0.0 is the min value, reduce by decibels
-                self.volume = max(0.0, self.volume-decibels)
-                interface.SetMasterVolume(self.volume, None)
+        if (app := sessionRegistry.app(self.process_name)):
+            # read and write in the same pass over the app's sessions
+            self.volume = app.adjust_volume(-decibels)
+            return self.volume
 
     def increase_volume(self, decibels):
-        sessions = AudioUtilities.GetAllSessions()
-        for session in sessions:
-            interface = session.SimpleAudioVolume
-            if session.Process and session.Process.name() == self.process_name:
-
-                # 1.0 is the max value, raise by decibels
-                self.volume = min(1.0, self.volume+decibels)
-                interface.SetMasterVolume(self.volume, None)
+        if (app := sessionRegistry.app(self.process_name)):
+            self.volume = app.adjust_volume(decibels)
+            return self.volume
 
 
 def muteAndUnMute(process, value):
-    pythoncom.CoInitialize()
-    sessions = AudioUtilities.GetAllSessions()
-    for session in sessions:
-        volume = session.SimpleAudioVolume
-        if session.Process and session.Process.name() == process:
-            if value == "Toggle":
-                value = 0 if volume.GetMute() == 1 else 1
-            elif value == "Mute":
-                value = 1
-            elif value == "Unmute":
-                value = 0
-            volume.SetMute(value, None)
+    if (app := sessionRegistry.app(process)):
+        if value == "Toggle":
+            app.toggle_mute()
+        elif value == "Mute":
+            app.set_mute(True)
+        elif value == "Unmute":
+            app.set_mute(False)
 
 
 def volumeChanger(process, action, value):
-    pythoncom.CoInitialize()
+    """
+    Set/Increase/Decrease the volume of `process` (or "Master Volume") by `value` percent.
+    Returns the volume that was applied (0-100) or None if there was nothing to change.
+    """
     if process == "Master Volume":
         if action == "Set":
-            setMasterVolume(value)
+            master_vol = int(value)
         else:
-            value = +value if action == "Increase" else -value
-            setMasterVolume(100 if (master_vol := getMasterVolume() + value) and master_vol > 100 else master_vol)
-    elif action == "Set":
-        AudioController(str(process)).set_volume((int(value)*0.01))
+            value = +int(value) if action == "Increase" else -int(value)
+            master_vol = getMasterVolume() + value
+        master_vol = max(0, min(master_vol, 100))
+        setMasterVolume(master_vol)
+        return master_vol
+
+    controller = AudioController(str(process))
+    if action == "Set":
+        volume = controller.set_volume(int(value)*0.01)
     elif action == "Increase":
-        AudioController(str(process)).increase_volume((int(value)*0.01))
-
+        volume = controller.increase_volume(int(value)*0.01)
     elif action == "Decrease":
-        AudioController(str(process)).decrease_volume((int(value)*0.01))
+        volume = controller.decrease_volume(int(value)*0.01)
+    else:
+        volume = None
+    return round(volume*100) if volume is not None else None
 
 
 def setMasterVolume(Vol):
-    pythoncom.CoInitialize()
-    devices = AudioUtilities.GetSpeakers()
-    interface = devices.Activate(
-        IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-    volume = cast(interface, POINTER(IAudioEndpointVolume))
-    scalarVolume = int(Vol) / 100
-    volume.SetMasterVolumeLevelScalar(scalarVolume, None)
+    setDeviceVolume("default", "Output", Vol)
 
 def getMasterVolume() -> int:
-    devices = AudioUtilities.GetSpeakers()
-    interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+    volume = getBackend().endpoint_volume("default", EDataFlow.eRender.value)
+    if volume is None:
+        return 0
+    return int(round(volume.GetMasterVolumeLevelScalar() * 100))
 
-    # Get the volume range and current volume level
-    volume = interface.QueryInterface(IAudioEndpointVolume)
-    volume_percent = int(round(volume.GetMasterVolumeLevelScalar() * 100))
+def getDeviceObject(device_id, direction="Output"):
+    return getBackend().endpoint_volume(device_id, flowFromDirection(direction))
 
-    devices.Release()
-    # Release the interface COM object
-    comtypes.CoUninitialize()
-    return volume_percent
+def getDeviceVolume(device_id, direction="Output"):
+    """ volume of a device in percent, None if it isn't available """
+    if (volume := getBackend().endpoint_volume(device_id, flowFromDirection(direction))):
+        return volume.GetMasterVolumeLevelScalar() * 100
 
-def getDeviceObject(device_id, direction="Output"):
-    deviceEnumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator,
-            IMMDeviceEnumerator,
-            comtypes.CLSCTX_INPROC_SERVER)
-    
-    if deviceEnumerator is None: return None
-
-    flow = EDataFlow.eCapture.value
-    if direction.lower() == "output":
-        flow = EDataFlow.eRender.value
-
-    devices = deviceEnumerator.EnumAudioEndpoints(flow, 1)
-
-    for dev in devices:
-        if dev.GetId() == device_id:
-            return dev.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-    
-    return None
-    
 def setDeviceVolume(device_id, direction, volume_level):
-    pythoncom.CoInitialize()
-    if device_id == "default":
-        if direction.lower() == "output":
-            device = AudioUtilities.GetSpeakers()
-        else:
-            device = AudioUtilities.GetMicrophone()
-        device_object = device.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-    else:
-        device_object = getDeviceObject(device_id, direction)
-
-    if device_object:
-        volume = cast(device_object, POINTER(IAudioEndpointVolume))
+    if (volume := getBackend().endpoint_volume(device_id, flowFromDirection(direction))):
         scalar_volume = float(volume_level) / 100
         volume.SetMasterVolumeLevelScalar(scalar_volume, None)
 
-    pythoncom.CoUninitialize()
-
 def get_process_id(name):
-    sessions = AudioUtilities.GetAllSessions()
-    for session in sessions:
-        if session.Process and session.Process.name() == name:
-            return session.Process.pid
-    return None
+    return sessionRegistry.process_id(name)
+
+def get_process_ids(name):
+    return sessionRegistry.process_ids(name)
@@ -1,73 +1,67 @@
 from __future__ import print_function
 
-import ctypes
+from .backend import DEVICE_STATE_ACTIVE, flowFromDirection, getBackend
+from .deviceCatalog import DeviceCatalog
+from .deviceNotifier import deviceNotifier
 
-import comtypes
-from pycaw.constants import CLSID_MMDeviceEnumerator
-from pycaw.pycaw import (DEVICE_STATE, AudioUtilities, EDataFlow,
-                         IMMDeviceEnumerator)
 
-from . import policyconfig as pc
+def enumerateDevices(flow, State = DEVICE_STATE_ACTIVE):
+    """ [(device id, friendly name)] of every endpoint for `flow` in `State` """
+    return getBackend().enumerate_devices(flow, State)
 
-audioDll = ctypes.CDLL("AudioDLL.dll")
+deviceCatalog = DeviceCatalog(enumerateDevices)
+deviceNotifier.subscribe(deviceNotifier.DEVICES_CHANGED, deviceCatalog.invalidate)
 
-class MyAudioUtilities(AudioUtilities):
-    @staticmethod
-    def GetDeviceState(devicetype, roletype):
-        device_enumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator,
-            IMMDeviceEnumerator,
-            comtypes.CLSCTX_INPROC_SERVER)
+_friendlyNames = {}  # device id -> friendly name
+deviceNotifier.subscribe(deviceNotifier.DEVICES_CHANGED, lambda device_id: _friendlyNames.pop(device_id, None))
 
-        default_device = device_enumerator.GetDefaultAudioEndpoint(devicetype, roletype)
-        return default_device
+def getDefaultDevice(edata, erole):
+    """
+    (device id, friendly name) of the default endpoint for `edata`/`erole`, ("", "") if there is none.
+    Only the id is asked from the backend, the name is read once per endpoint and cached.
+    """
+    if not (device_id := getBackend().default_device_id(edata, erole)):
+        return "", ""
+    return device_id, getDeviceName(device_id)
 
-    @staticmethod
-    def getAllDevices(direction, State = DEVICE_STATE.ACTIVE.value):
-        devices = {}
-        # for all use EDataFlow.eAll.value
-        if direction.lower() == "input":
-            Flow = EDataFlow.eCapture.value     # 1
-        else:
-            # Output
-            Flow = EDataFlow.eRender.value      # 0
-        comtypes.CoInitialize()
-        deviceEnumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator,
-            IMMDeviceEnumerator,
-            comtypes.CLSCTX_INPROC_SERVER)
-        if deviceEnumerator is None:
-            return devices
-        
-
-        collection = deviceEnumerator.EnumAudioEndpoints(Flow, State)
-        if collection is None:
-            return devices
-
-        count = collection.GetCount()
-        for i in range(count):
-            dev = collection.Item(i)
-            if dev is not None:
-                createDev = AudioUtilities.CreateDevice(dev)
-                if not ": None" in str(createDev):
-                    devices[createDev.FriendlyName] = createDev.id
-                createDev._dev.Release()
-                
-        comtypes.CoUninitialize()
-        return devices
+def getDeviceName(device_id):
+    """ friendly name of `device_id`, read once per endpoint and cached """
+    if (name := _friendlyNames.get(device_id)) is None:
+        name = getBackend().device_name(device_id) or ""
+        _friendlyNames[device_id] = name
+    return name
 
 
+def startDeviceNotifications():
+    """ Feed the deviceNotifier with the backend's endpoint notifications """
+    getBackend().start_notifications(deviceNotifier)
 
-def switchOutput(deviceId, role):
-    policy_config = comtypes.CoCreateInstance(
-        pc.CLSID_PolicyConfigClient,
-        pc.IPolicyConfig,
-        comtypes.CLSCTX_ALL
-    )
-    policy_config.SetDefaultEndpoint(deviceId, role)
-    policy_config.Release()
+def stopDeviceNotifications():
+    getBackend().stop_notifications()
 
-SetApplicationEndpoint = audioDll.SetApplicationEndpoint
+class MyAudioUtilities(object):
+    @staticmethod
+    def getAllDevices(direction, State = DEVICE_STATE_ACTIVE):
+        """ {friendly name: device id}, served from the deviceCatalog for active devices """
+        Flow = flowFromDirection(direction)
+
+        if State == DEVICE_STATE_ACTIVE:
+            return deviceCatalog.devices(Flow)
+        return {name: device_id for device_id, name in enumerateDevices(Flow, State)}
 
 
 
+def switchOutput(deviceId, role):
+    getBackend().set_default_device(deviceId, role)
+
+def nextDevice(deviceIds, currentId):
+    """ The id after `currentId` in `deviceIds`, wrapping around, the first one when `currentId` isn't in there """
+    if not deviceIds:
+        return None
+    try:
+        return deviceIds[(deviceIds.index(currentId) + 1) % len(deviceIds)]
+    except ValueError:
+        return deviceIds[0]
+
+def SetApplicationEndpoint(deviceId, flow, processId):
+    getBackend().set_application_endpoint(deviceId, flow, processId)
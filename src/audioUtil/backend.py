@@ -0,0 +1,146 @@
+import sys
+from collections import namedtuple
+from enum import Enum, IntEnum
+
+
+# same values as the Windows/pycaw enums so either can be passed around
+class EDataFlow(Enum):
+    eRender = 0
+    eCapture = 1
+    eAll = 2
+
+
+class ERole(Enum):
+    eConsole = 0
+    eMultimedia = 1
+    eCommunications = 2
+
+
+class AudioSessionState(IntEnum):
+    Inactive = 0
+    Active = 1
+    Expired = 2
+
+
+DEVICE_STATE_ACTIVE = 0x00000001
+
+ForegroundWindow = namedtuple("ForegroundWindow", ["hwnd", "pid", "exe", "title"])
+NO_WINDOW = ForegroundWindow(0, 0, "", "")
+
+
+def flowFromDirection(direction):
+    """ "Output"/"Input" -> EDataFlow value """
+    return EDataFlow.eCapture.value if direction.lower() == "input" else EDataFlow.eRender.value
+
+
+class AudioBackend(object):
+    """
+    Everything the plugin needs from the audio stack.
+
+    Backends are called from any thread and take care of their own threading
+    (COM apartments and the like). Session and endpoint-volume objects handed
+    out by a backend use the Windows method names (GetMasterVolume/
+    SetMasterVolume/GetMute/SetMute for sessions, GetMasterVolumeLevelScalar/
+    SetMasterVolumeLevelScalar/GetMute/SetMute for endpoints, GetPeakValue for
+    meters) so callers don't care which one is active.
+    """
+    name = None
+    call_observer = None
+
+    # ---- sessions
+    def enumerate_sessions(self):
+        """ [RegisteredSession] of every live session, used for a full resync """
+        raise NotImplementedError
+
+    def watch_sessions(self, listener_factory):
+        """
+        Call `listener_factory(session, volume, mute, state)` for every current and
+        future session. The returned listener gets `update_volume(volume)`,
+        `update_mute(muted)` and `update_state(state)` calls; the last one it
+        gets is `update_state(AudioSessionState.Expired)`.
+        """
+        raise NotImplementedError
+
+    # ---- endpoints
+    def enumerate_devices(self, flow, state=DEVICE_STATE_ACTIVE):
+        """ [(device id, friendly name)] """
+        raise NotImplementedError
+
+    def default_device_id(self, flow, role):
+        """ id of the default endpoint, "" if there is none """
+        raise NotImplementedError
+
+    def device_name(self, device_id):
+        """ friendly name of `device_id`, None if unknown """
+        raise NotImplementedError
+
+    def set_default_device(self, device_id, role):
+        raise NotImplementedError
+
+    def endpoint_volume(self, device_id, flow):
+        """ endpoint volume interface of `device_id` ("default" for the multimedia default), None if unknown """
+        raise NotImplementedError
+
+    def set_application_endpoint(self, device_id, flow, pid):
+        """ route `pid` to `device_id` for `flow`, "" resets it to the default device """
+        raise NotImplementedError
+
+    def application_endpoint(self, flow, pid):
+        """ device `pid` was routed to for `flow` through this backend, "" for the default device """
+        return ""
+
+    def endpoint_meter(self, device_id, flow):
+        """ peak meter (GetPeakValue) of `device_id` ("default" for the multimedia default), None if unknown or unsupported """
+        return None
+
+    def watch_endpoint_volume(self, device_id, flow, callback):
+        """
+        Call `callback(volume, muted)` whenever the volume or mute of `device_id` changes.
+        Returns a token for `unwatch_endpoint_volume`, None if the backend can't do it.
+        """
+        return None
+
+    def unwatch_endpoint_volume(self, token):
+        pass
+
+    def start_notifications(self, notifier):
+        """ feed a DeviceNotifier with endpoint added/removed/state/default changes """
+        raise NotImplementedError
+
+    def stop_notifications(self):
+        raise NotImplementedError
+
+    # ---- focus
+    def foreground(self):
+        """ tracker whose `snapshot` is the focused window as a ForegroundWindow """
+        raise NotImplementedError
+
+    # ---- threading
+    def call(self, fn, *args):
+        """ run `fn(*args)` where the backend's objects live, so several calls on them cost one hop """
+        return fn(*args)
+
+    # ---- instrumentation
+    def observe_calls(self, observer):
+        """ call `observer(method name, nanoseconds)` after every audio interface call, None stops it """
+        self.call_observer = observer
+
+
+_backend = None
+
+def getBackend():
+    """ The active backend, COM on Windows and the simulated one anywhere else unless `setBackend` picked one """
+    global _backend
+    if _backend is None:
+        if sys.platform == "win32":
+            from .comBackend import ComAudioBackend
+            _backend = ComAudioBackend()
+        else:
+            from .simBackend import SimulatedAudioBackend
+            _backend = SimulatedAudioBackend()
+    return _backend
+
+def setBackend(backend):
+    global _backend
+    _backend = backend
+    return backend
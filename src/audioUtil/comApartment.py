@@ -0,0 +1,119 @@
+from concurrent.futures import Future
+from logging import getLogger
+from queue import SimpleQueue
+from threading import Lock, Thread, get_ident
+from time import perf_counter_ns
+
+log = getLogger(__name__)
+
+
+class ComApartment(object):
+    """
+    One long-lived worker thread that owns COM objects.
+
+    Callers hand work to it with `submit` (a Future) or `call` (blocks for the
+    result, runs inline when already on the worker). `initialize`/`uninitialize`
+    run once on the worker thread, so the apartment is set up a single time
+    instead of around every call. Objects that are expensive to create are kept
+    with `cached` and dropped with `invalidate`; both only touch the cache from
+    the worker thread, so the objects are created, used and released there.
+    `observer(op, nanoseconds)`, when set, is called after every call that was
+    given an operation name with `op=`, whether it was queued or ran inline.
+    """
+
+    def __init__(self, name="ComApartment", initialize=None, uninitialize=None):
+        self.name = name
+        self._initialize = initialize
+        self._uninitialize = uninitialize
+        self._queue = SimpleQueue()
+        self._lock = Lock()
+        self._thread = None
+        self._ident = None
+        self._objects = {}  # key -> object, worker thread only
+        self.observer = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        self._ident = get_ident()
+        if self._initialize:
+            self._initialize()
+        try:
+            while (item := self._queue.get()) is not None:
+                future, op, fn, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                start = perf_counter_ns()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                if op is not None and (observer := self.observer) is not None:
+                    observer(op, perf_counter_ns() - start)
+        finally:
+            self._objects.clear()
+            if self._uninitialize:
+                self._uninitialize()
+
+    @property
+    def on_worker(self):
+        return get_ident() == self._ident
+
+    def submit(self, fn, *args, op=None, **kwargs):
+        self.start()
+        future = Future()
+        self._queue.put((future, op, fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, op=None, **kwargs):
+        if not self.on_worker:
+            return self.submit(fn, *args, op=op, **kwargs).result()
+        if op is None or (observer := self.observer) is None:
+            return fn(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observer(op, perf_counter_ns() - start)
+
+    def cached(self, key, factory):
+        """ The object stored under `key`, created with `factory()` the first time """
+        def get():
+            if (obj := self._objects.get(key)) is None:
+                obj = self._objects[key] = factory()
+            return obj
+        return self.call(get)
+
+    def invalidate(self, predicate=None):
+        """ Drop cached objects whose key matches `predicate`, all of them without one """
+        def drop():
+            for key in [key for key in self._objects if predicate is None or predicate(key)]:
+                del self._objects[key]
+        self.call(drop)
+
+    def proxy(self, obj):
+        """ `obj` with every method call run on the worker thread """
+        return ApartmentProxy(self, obj)
+
+    def stop(self):
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
+
+
+class ApartmentProxy(object):
+    """ Forwards method calls on a COM object to the apartment that owns it """
+    __slots__ = ("_apartment", "_obj")
+
+    def __init__(self, apartment, obj):
+        self._apartment = apartment
+        self._obj = obj
+
+    def __getattr__(self, name):
+        method = getattr(self._obj, name)
+        return lambda *args, **kwargs: self._apartment.call(method, *args, op=name, **kwargs)
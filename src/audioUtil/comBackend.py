@@ -0,0 +1,309 @@
+import ctypes
+from ctypes import POINTER, cast
+
+# pycaw.magic sets sys.coinit_flags for the multithreaded apartment, it has to be imported before comtypes/pythoncom
+import pycaw.magic  # noqa: F401
+import comtypes
+import pythoncom
+from comtypes import CLSCTX_ALL, COMError, GUID
+from comtypes.automation import VT_LPWSTR
+from pycaw.api.audioclient import ISimpleAudioVolume
+from pycaw.api.endpointvolume import IAudioMeterInformation
+from pycaw.api.mmdeviceapi.depend.structures import PROPERTYKEY
+from pycaw.callbacks import AudioEndpointVolumeCallback, MMNotificationClient
+from pycaw.constants import STGM, CLSID_MMDeviceEnumerator
+from pycaw.magic import MagicManager, MagicSession
+from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume, IMMDeviceEnumerator
+
+from . import policyconfig as pc
+from .backend import (DEVICE_STATE_ACTIVE, AudioBackend, AudioSessionState,
+                      ERole)
+from .comApartment import ComApartment
+from .processCache import processCache
+from .sessionRegistry import RegisteredSession
+
+PKEY_Device_FriendlyName = PROPERTYKEY(GUID("{a45c254e-df1c-4efd-8020-67d146a850e0}"), 14)
+
+def getFriendlyName(dev):
+    """ Reads only the friendly name out of the device property store """
+    store = dev.OpenPropertyStore(STGM.STGM_READ.value)
+    if store is None:
+        return None
+    try:
+        value = store.GetValue(PKEY_Device_FriendlyName)
+    except COMError:
+        return None
+    try:
+        return value.GetValue() if value.vt == VT_LPWSTR else None
+    finally:
+        value.clear()
+
+def createDeviceEnumerator():
+    return comtypes.CoCreateInstance(
+        CLSID_MMDeviceEnumerator,
+        IMMDeviceEnumerator,
+        comtypes.CLSCTX_INPROC_SERVER)
+
+def sessionMeter(ctl, apartment):
+    """ proxied IAudioMeterInformation of a session control, None if the session has none """
+    try:
+        return apartment.proxy(ctl.QueryInterface(IAudioMeterInformation))
+    except COMError:
+        return None
+
+def sessionFromMagicRoot(magic_root_session, apartment):
+    def interfaces():
+        ctl2 = magic_root_session._ctl2
+        return (ctl2.GetSessionInstanceIdentifier(), magic_root_session._sav or ctl2.QueryInterface(ISimpleAudioVolume),
+                sessionMeter(ctl2, apartment))
+
+    key, simpleAudioVolume, meter = apartment.call(interfaces, op="QueryInterface")
+    return RegisteredSession(key, magic_root_session.app_exec, magic_root_session.pid, apartment.proxy(simpleAudioVolume), meter)
+
+
+class MagicSessionBridge(MagicSession):
+    """ MagicSession that hands the session and its callbacks to a backend-neutral listener """
+
+    def __init__(self, listener_factory, apartment):
+        self.listener = None
+        super().__init__(volume_callback=self._volume_changed,
+                         mute_callback=self._mute_changed,
+                         state_callback=self._state_changed)
+        self.session = sessionFromMagicRoot(self.magic_root_session, apartment)
+        self.listener = listener_factory(self.session, self.volume, self.mute, AudioSessionState(int(self.state)))
+
+    def _volume_changed(self, new_volume):
+        if self.listener is not None:
+            self.listener.update_volume(new_volume)
+
+    def _mute_changed(self, muted):
+        if self.listener is not None:
+            self.listener.update_mute(muted)
+
+    def _state_changed(self, new_state):
+        if self.listener is not None:
+            self.listener.update_state(AudioSessionState(int(new_state)))
+
+
+class EndpointNotificationClient(MMNotificationClient):
+    """
+    Forwards IMMNotificationClient callbacks to a DeviceNotifier.
+
+    The callbacks must not block or make COM calls, so they only queue the
+    event on the apartment; the listeners (name lookups, endpoint volume
+    rebinds) run on the apartment thread, in the order the events came in.
+    """
+
+    def __init__(self, notifier, apartment):
+        super().__init__()
+        self.notifier = notifier
+        self.apartment = apartment
+
+    def on_default_device_changed(self, flow, flow_id, role, role_id, default_device_id):
+        self.apartment.submit(self.notifier.default_changed, flow_id, role_id, default_device_id)
+
+    def on_device_added(self, added_device_id):
+        self.apartment.submit(self.notifier.devices_changed, added_device_id)
+
+    def on_device_removed(self, removed_device_id):
+        self.apartment.submit(self.notifier.devices_changed, removed_device_id)
+
+    def on_device_state_changed(self, device_id, new_state, new_state_id):
+        self.apartment.submit(self.notifier.devices_changed, device_id)
+
+
+class EndpointVolumeClient(AudioEndpointVolumeCallback):
+    """ Forwards IAudioEndpointVolumeCallback notifications as callback(volume, muted) """
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def on_notify(self, new_volume, new_mute, event_context, channels, channel_volumes):
+        self.callback(new_volume, bool(new_mute))
+
+
+class ComAudioBackend(AudioBackend):
+    """
+    The real thing: Core Audio through pycaw/comtypes plus AudioDLL for per-app routing.
+
+    Every COM call runs on one ComApartment thread which also keeps the device
+    enumerator, the policy config and endpoint volume and meter interfaces
+    alive between calls; the objects handed out are proxies that forward to
+    that thread.
+    """
+    name = "com"
+
+    def __init__(self):
+        self.audioDll = ctypes.CDLL("AudioDLL.dll")
+        self.apartment = ComApartment("ComAudio", initialize=pythoncom.CoInitialize, uninitialize=pythoncom.CoUninitialize)
+        self._notificationClient = None
+        self._foreground = None
+        self._routing = {}  # (pid, flow) -> device id, AudioDLL can't be asked
+
+    def _enumerator(self):
+        return self.apartment.cached("enumerator", createDeviceEnumerator)
+
+    # ---- sessions
+    def enumerate_sessions(self):
+        if MagicManager.magic_activated:
+            return [sessionFromMagicRoot(root, self.apartment) for root in list(MagicManager.magic_root_sessions.values())]
+        return self.apartment.call(self._all_sessions, op="GetAllSessions")
+
+    def _all_sessions(self):
+        sessions = []
+        for audio_session in AudioUtilities.GetAllSessions():
+            if (name := processCache.name(audio_session.ProcessId)):
+                sessions.append(RegisteredSession(audio_session.InstanceIdentifier, name,
+                                                  audio_session.ProcessId, self.apartment.proxy(audio_session.SimpleAudioVolume),
+                                                  sessionMeter(audio_session._ctl, self.apartment)))
+        return sessions
+
+    def watch_sessions(self, listener_factory):
+        self.apartment.call(MagicManager.magic_session, MagicSessionBridge, listener_factory, self.apartment,
+                            op="RegisterSessionNotification")
+
+    # ---- endpoints
+    def enumerate_devices(self, flow, state=DEVICE_STATE_ACTIVE):
+        return self.apartment.call(self._enumerate_devices, flow, state, op="EnumAudioEndpoints")
+
+    def _enumerate_devices(self, flow, state):
+        devices = []
+        collection = self._enumerator().EnumAudioEndpoints(flow, state)
+        if collection is None:
+            return devices
+
+        for i in range(collection.GetCount()):
+            dev = collection.Item(i)
+            if dev is not None and (name := getFriendlyName(dev)):
+                devices.append((dev.GetId(), name))
+        return devices
+
+    def default_device_id(self, flow, role):
+        return self.apartment.call(self._default_device_id, flow, role, op="GetDefaultAudioEndpoint")
+
+    def _default_device_id(self, flow, role):
+        try:
+            device = self._enumerator().GetDefaultAudioEndpoint(flow, role)
+        except COMError:
+            return ""
+        return device.GetId() if device else ""
+
+    def device_name(self, device_id):
+        return self.apartment.call(self._device_name, device_id, op="OpenPropertyStore")
+
+    def _device_name(self, device_id):
+        try:
+            return getFriendlyName(self._enumerator().GetDevice(device_id))
+        except COMError:
+            return None
+
+    def set_default_device(self, device_id, role):
+        self.apartment.call(self._set_default_device, device_id, role, op="SetDefaultEndpoint")
+
+    def _set_default_device(self, device_id, role):
+        policy_config = self.apartment.cached("policyConfig", lambda: comtypes.CoCreateInstance(
+            pc.CLSID_PolicyConfigClient,
+            pc.IPolicyConfig,
+            comtypes.CLSCTX_ALL
+        ))
+        policy_config.SetDefaultEndpoint(device_id, role)
+        self._forget_endpoints(default=True)
+
+    def endpoint_volume(self, device_id, flow):
+        if (volume := self.apartment.call(self._endpoint_interface, "endpointVolume", IAudioEndpointVolume, device_id, flow,
+                                             op="Activate")) is not None:
+            return self.apartment.proxy(volume)
+        return None
+
+    def endpoint_meter(self, device_id, flow):
+        if (meter := self.apartment.call(self._endpoint_interface, "endpointMeter", IAudioMeterInformation, device_id, flow,
+                                            op="Activate")) is not None:
+            return self.apartment.proxy(meter)
+        return None
+
+    def _endpoint_interface(self, kind, interface, device_id, flow):
+        def activate():
+            try:
+                if device_id == "default":
+                    device = self._enumerator().GetDefaultAudioEndpoint(flow, ERole.eMultimedia.value)
+                else:
+                    device = self._enumerator().GetDevice(device_id)
+            except COMError:
+                return None
+            if not device:
+                return None
+            return cast(device.Activate(interface._iid_, CLSCTX_ALL, None), POINTER(interface))
+
+        # a None result is not cached, an unknown device is looked up again next time
+        return self.apartment.cached((kind, device_id, flow), activate)
+
+    def watch_endpoint_volume(self, device_id, flow, callback):
+        return self.apartment.call(self._watch_endpoint_volume, device_id, flow, callback, op="RegisterControlChangeNotify")
+
+    def _watch_endpoint_volume(self, device_id, flow, callback):
+        try:
+            device = self._enumerator().GetDevice(device_id)
+        except COMError:
+            return None
+        if not device:
+            return None
+        # a volume interface of its own, the cached ones come and go with device changes
+        volume = cast(device.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None), POINTER(IAudioEndpointVolume))
+        client = EndpointVolumeClient(callback)
+        volume.RegisterControlChangeNotify(client)
+        return (volume, client)
+
+    def unwatch_endpoint_volume(self, token):
+        volume, client = token
+        self.apartment.call(volume.UnregisterControlChangeNotify, client, op="UnregisterControlChangeNotify")
+
+    def _forget_endpoints(self, device_id=None, default=False):
+        """ drop cached endpoint volumes and meters of `device_id`, and the ones for the default devices when `default` """
+        self.apartment.invalidate(lambda key: key[0] in ("endpointVolume", "endpointMeter") and
+                                  ((default and key[1] == "default") or (device_id is not None and key[1] == device_id)))
+
+    def set_application_endpoint(self, device_id, flow, pid):
+        self.apartment.call(self.audioDll.SetApplicationEndpoint, device_id, flow, pid, op="SetApplicationEndpoint")
+        if device_id:
+            self._routing[(pid, flow)] = device_id
+        else:
+            self._routing.pop((pid, flow), None)
+
+    def application_endpoint(self, flow, pid):
+        return self._routing.get((pid, flow), "")
+
+    def start_notifications(self, notifier):
+        """ The enumerator has to stay alive for as long as we want the notifications, the apartment keeps it """
+        if self._notificationClient is not None:
+            return
+        # the client hands the events to the notifier on the apartment thread, these are subscribed first
+        # so the listeners that come after them never get a cached interface of the old device
+        notifier.subscribe(notifier.DEVICES_CHANGED, lambda device_id: self._forget_endpoints(device_id, default=True))
+        notifier.subscribe(notifier.DEFAULT_CHANGED, lambda flow, role, device_id: self._forget_endpoints(default=True))
+        self._notificationClient = EndpointNotificationClient(notifier, self.apartment)
+        self.apartment.call(lambda: self._enumerator().RegisterEndpointNotificationCallback(self._notificationClient),
+                            op="RegisterEndpointNotificationCallback")
+
+    def stop_notifications(self):
+        if self._notificationClient is not None:
+            client, self._notificationClient = self._notificationClient, None
+            self.apartment.call(lambda: self._enumerator().UnregisterEndpointNotificationCallback(client),
+                                op="UnregisterEndpointNotificationCallback")
+
+    # ---- focus
+    def foreground(self):
+        if self._foreground is None:
+            from .foregroundTracker import foregroundTracker
+            self._foreground = foregroundTracker
+        return self._foreground
+
+    # ---- threading
+    def call(self, fn, *args):
+        return self.apartment.call(fn, *args)
+
+    # ---- instrumentation
+    def observe_calls(self, observer):
+        super().observe_calls(observer)
+        # calls without an operation name (batches, cache lookups) are not recorded, the named calls inside them are
+        self.apartment.observer = observer
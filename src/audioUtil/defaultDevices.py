@@ -0,0 +1,81 @@
+from threading import Lock, RLock
+
+
+class DefaultDeviceTracker(object):
+    """
+    Keeps the default endpoint of every watched (flow, role) pair up to date.
+
+    Changes are picked up from the notifier's DEFAULT_CHANGED event, so nothing
+    is looked up while the defaults stay put. `resolve(flow, role)` must return
+    `(device_id, friendly_name)`; `on_change(flow, role, device_id, name)` is
+    called whenever a watched default changes (and once for each pair on `start`).
+    With `name(device_id)` a change takes the new id from the notification and
+    only looks its name up, instead of asking for the default again.
+
+    Checking a pair and updating it is one step, so a change reported twice
+    (by `changed` and by the notification) is only handled once. `call(fn,
+    *args)`, e.g. the backend's, runs `changed` and `resync` on the thread the
+    notifications come in on, so nothing waits on that thread while holding
+    the tracker.
+    """
+
+    def __init__(self, resolve, notifier, on_change=None, name=None, call=None):
+        self._resolve = resolve
+        self._notifier = notifier
+        self._on_change = on_change
+        self._name = name
+        self._call = call or (lambda fn, *args: fn(*args))
+        self._lock = Lock()
+        self._updating = RLock()  # held from the check until on_change returned
+        self._current = {}  # (flow, role) -> (device_id, name)
+
+    def watch(self, flow, role):
+        with self._lock:
+            self._current.setdefault((flow, role), None)
+
+    def start(self):
+        self._notifier.subscribe(self._notifier.DEFAULT_CHANGED, self._default_changed)
+        self.resync()
+
+    def stop(self):
+        self._notifier.unsubscribe(self._notifier.DEFAULT_CHANGED, self._default_changed)
+
+    def get(self, flow, role):
+        """ (device_id, name) of the default for `flow`/`role`, None if it is not watched or known yet """
+        with self._lock:
+            return self._current.get((flow, role))
+
+    def resync(self):
+        """ Look every watched pair up again, only used as a slow safety net """
+        self._call(self._resync)
+
+    def _resync(self):
+        with self._updating:
+            with self._lock:
+                pairs = list(self._current)
+            for flow, role in pairs:
+                self._update(flow, role)
+
+    def changed(self, flow, role, device_id):
+        """ We just made `device_id` the default ourselves, take it now instead of when the notification comes in """
+        self._call(self._default_changed, flow, role, device_id)
+
+    def _default_changed(self, flow, role, device_id):
+        with self._updating:
+            with self._lock:
+                if (flow, role) not in self._current:
+                    return
+                current = self._current[(flow, role)]
+            if current is None or current[0] != device_id:
+                self._update(flow, role, device_id)
+
+    def _update(self, flow, role, device_id=None):
+        if device_id and self._name is not None:
+            device = (device_id, self._name(device_id) or "")
+        else:
+            device = self._resolve(flow, role)
+        with self._lock:
+            changed = self._current.get((flow, role)) != device
+            self._current[(flow, role)] = device
+        if changed and self._on_change:
+            self._on_change(flow, role, *device)
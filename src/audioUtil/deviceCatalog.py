@@ -0,0 +1,63 @@
+from threading import Lock
+
+
+class DeviceCatalog(object):
+    """
+    Process-wide name <-> id maps of the active endpoints, per data flow.
+
+    `enumerate_devices(flow)` must return `[(device_id, friendly_name), ...]`.
+    It is only called when a flow is first asked for or after the catalog was
+    invalidated by an endpoint notification (or an explicit `refresh`).
+    """
+
+    def __init__(self, enumerate_devices):
+        self._enumerate = enumerate_devices
+        self._lock = Lock()
+        self._generation = 0
+        self._by_name = {}  # flow -> {name: id}
+        self._by_id = {}    # flow -> {id: name}
+        self._built_at = {} # flow -> generation the maps were built at
+
+    def invalidate(self, device_id=None):
+        """ Forget everything, the next lookup enumerates again """
+        with self._lock:
+            self._generation += 1
+
+    def refresh(self, flow=None):
+        """ Rebuild `flow` (or every known flow) right now """
+        with self._lock:
+            self._generation += 1
+            flows = [flow] if flow is not None else list(self._built_at)
+        for f in flows:
+            self._load(f)
+
+    def _load(self, flow):
+        with self._lock:
+            generation = self._generation
+        devices = self._enumerate(flow)
+        by_name = {name: device_id for device_id, name in devices}
+        by_id = {device_id: name for device_id, name in devices}
+        with self._lock:
+            # a notification that arrived while enumerating makes this result stale already,
+            # hand it out for this call but don't keep it
+            if generation == self._generation:
+                self._by_name[flow] = by_name
+                self._by_id[flow] = by_id
+                self._built_at[flow] = generation
+        return by_name, by_id
+
+    def _maps(self, flow):
+        with self._lock:
+            if self._built_at.get(flow) == self._generation:
+                return self._by_name[flow], self._by_id[flow]
+        return self._load(flow)
+
+    def devices(self, flow):
+        """ {friendly name: device id} """
+        return dict(self._maps(flow)[0])
+
+    def device_id(self, flow, name):
+        return self._maps(flow)[0].get(name)
+
+    def device_name(self, flow, device_id):
+        return self._maps(flow)[1].get(device_id)
@@ -0,0 +1,43 @@
+from threading import Lock
+
+
+class DeviceNotifier(object):
+    """
+    Fans endpoint notifications out to whoever is interested.
+
+    On Windows the IMMNotificationClient in audioSwitch feeds this, but
+    anything can call `devices_changed`/`default_changed` so the listeners
+    can be driven by a scripted stand-in as well.
+    """
+    DEVICES_CHANGED = "devicesChanged"   # callback(device_id)
+    DEFAULT_CHANGED = "defaultChanged"   # callback(flow, role, device_id)
+
+    def __init__(self):
+        self._lock = Lock()
+        self._listeners = {self.DEVICES_CHANGED: [], self.DEFAULT_CHANGED: []}
+
+    def subscribe(self, event, callback):
+        with self._lock:
+            self._listeners[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        with self._lock:
+            if callback in self._listeners[event]:
+                self._listeners[event].remove(callback)
+
+    def _emit(self, event, *args):
+        with self._lock:
+            listeners = list(self._listeners[event])
+        for callback in listeners:
+            callback(*args)
+
+    def devices_changed(self, device_id=None):
+        """ A device was added, removed or changed state """
+        self._emit(self.DEVICES_CHANGED, device_id)
+
+    def default_changed(self, flow, role, device_id):
+        """ The default endpoint for (flow, role) is now `device_id` """
+        self._emit(self.DEFAULT_CHANGED, flow, role, device_id)
+
+
+deviceNotifier = DeviceNotifier()
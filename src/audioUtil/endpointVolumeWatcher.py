@@ -0,0 +1,69 @@
+from logging import getLogger
+from threading import RLock
+
+from .backend import getBackend
+
+log = getLogger(__name__)
+
+
+class EndpointVolumeWatcher(object):
+    """
+    Named endpoint volume subscriptions that can be moved to another device.
+
+    `bind(name, device_id, flow, callback)` subscribes `callback(volume, muted)`
+    to the volume and mute changes of an endpoint, dropping whatever `name` was
+    bound to before, and calls it once with the current values so switching to
+    another device shows up right away. When the backend can't deliver the
+    callbacks `bind` returns False and `bound(name)` stays False, callers
+    should keep polling then.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend or getBackend()
+        self._lock = RLock()
+        self._bindings = {}  # name -> (device_id, token)
+
+    def bind(self, name, device_id, flow, callback):
+        with self._lock:
+            if (binding := self._bindings.get(name)) is not None and binding[0] == device_id:
+                return True
+            self.unbind(name)
+            if not device_id:
+                return False
+            try:
+                token = self._backend.watch_endpoint_volume(device_id, flow, callback)
+            except Exception as e:
+                log.info(f"Could not watch the volume of {device_id}: {e}")
+                token = None
+            if token is None:
+                return False
+            self._bindings[name] = (device_id, token)
+
+        if (volume := self._backend.endpoint_volume(device_id, flow)) is not None:
+            callback(volume.GetMasterVolumeLevelScalar(), bool(volume.GetMute()))
+        return True
+
+    def unbind(self, name):
+        with self._lock:
+            if (binding := self._bindings.pop(name, None)) is None:
+                return
+        try:
+            self._backend.unwatch_endpoint_volume(binding[1])
+        except Exception as e:
+            # the device may be gone already
+            log.debug(f"Could not stop watching the volume of {binding[0]}: {e}")
+
+    def bound(self, name):
+        with self._lock:
+            return name in self._bindings
+
+    def device(self, name):
+        """ id of the device `name` is bound to, None if it isn't """
+        with self._lock:
+            return binding[0] if (binding := self._bindings.get(name)) else None
+
+    def stop(self):
+        with self._lock:
+            names = list(self._bindings)
+        for name in names:
+            self.unbind(name)
@@ -0,0 +1,112 @@
+import math
+from contextlib import nullcontext
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic
+
+log = getLogger(__name__)
+
+# eased progress (0-1) by linear progress (0-1)
+FADE_CURVES = {
+    "linear": lambda t: t,
+    "ease in": lambda t: t * t,
+    "ease out": lambda t: 1.0 - (1.0 - t) ** 2,
+    "s-curve": lambda t: 0.5 - 0.5 * math.cos(math.pi * t),
+}
+
+
+class _Ramp(object):
+    __slots__ = ("write", "start", "target", "started", "duration", "curve", "last")
+
+    def __init__(self, write, start, target, started, duration, curve):
+        self.write = write
+        self.start = start
+        self.target = target
+        self.started = started
+        self.duration = duration
+        self.curve = curve
+        self.last = None
+
+    def value(self, now):
+        progress = min(1.0, (now - self.started) / self.duration) if self.duration > 0 else 1.0
+        return self.start + (self.target - self.start) * self.curve(progress), progress >= 1.0
+
+
+class FadeEngine(object):
+    """
+    Runs volume ramps from a single fixed-rate timer thread.
+
+    `fade(key, start, target, duration, write)` moves from `start` to `target`
+    (0.0-1.0) over `duration` seconds, calling `write(value)` once per tick.
+    Every ramp that is due is written in the same tick, inside `batch()`, so the
+    state updates they cause go out together. A new fade on a key replaces the
+    running one, `cancel(key)` stops it where it is. Values that didn't change
+    since the previous tick are not written again.
+    """
+
+    def __init__(self, interval=0.02, batch=None):
+        self.interval = interval
+        self.batch = batch or nullcontext
+        self._cond = Condition()
+        self._ramps = {}  # key -> _Ramp
+        self._thread = None
+
+    def fade(self, key, start, target, duration, write, curve="linear"):
+        ramp = _Ramp(write, min(1.0, max(0.0, start)), min(1.0, max(0.0, target)), monotonic(),
+                     max(0.0, duration), FADE_CURVES.get(curve, FADE_CURVES["linear"]))
+        with self._cond:
+            self._ramps[key] = ramp
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="FadeEngine", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            return self._ramps.pop(key, None) is not None
+
+    def cancel_all(self):
+        with self._cond:
+            self._ramps.clear()
+
+    def is_fading(self, key):
+        with self._cond:
+            return key in self._ramps
+
+    def _run(self):
+        next_tick = monotonic()
+        while True:
+            with self._cond:
+                while not self._ramps:
+                    self._cond.wait()
+                    next_tick = monotonic()
+                if (wait := next_tick - monotonic()) > 0:
+                    self._cond.wait(wait)
+                    continue
+                due = list(self._ramps.items())
+
+            now = monotonic()
+            finished = []
+            with self.batch():
+                for key, ramp in due:
+                    value, done = ramp.value(now)
+                    if done:
+                        finished.append((key, ramp))
+                    if (value := round(value, 4)) == ramp.last:
+                        continue
+                    try:
+                        ramp.write(value)
+                        ramp.last = value
+                    except Exception as e:
+                        log.warning(f"fade {key} failed, cancelling it: {e}")
+                        finished.append((key, ramp))
+
+            with self._cond:
+                for key, ramp in finished:
+                    # a fade started during this tick replaced it, keep the new one
+                    if self._ramps.get(key) is ramp:
+                        del self._ramps[key]
+
+            next_tick += self.interval
+            if next_tick < monotonic():
+                next_tick = monotonic() + self.interval
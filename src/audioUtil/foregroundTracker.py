@@ -0,0 +1,128 @@
+import ctypes
+from ctypes import wintypes
+from threading import Lock, Thread
+
+from .backend import NO_WINDOW, ForegroundWindow
+from .processCache import processCache
+
+user32 = ctypes.WinDLL("user32", use_last_error=True)
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+WM_QUIT = 0x0012
+
+WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                  wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+user32.SetWinEventHook.restype = wintypes.HANDLE
+user32.SetWinEventHook.argtypes = (wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+                                   wintypes.DWORD, wintypes.DWORD, wintypes.DWORD)
+user32.UnhookWinEvent.argtypes = (wintypes.HANDLE,)
+user32.GetForegroundWindow.restype = wintypes.HWND
+user32.GetWindowThreadProcessId.argtypes = (wintypes.HWND, ctypes.POINTER(wintypes.DWORD))
+user32.GetWindowTextLengthW.argtypes = (wintypes.HWND,)
+user32.GetWindowTextW.argtypes = (wintypes.HWND, wintypes.LPWSTR, ctypes.c_int)
+user32.GetMessageW.argtypes = (ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT)
+user32.PostThreadMessageW.argtypes = (wintypes.DWORD, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+
+def getWindowTitle(hwnd):
+    length = user32.GetWindowTextLengthW(hwnd)
+    if length <= 0:
+        return ""
+    buffer = ctypes.create_unicode_buffer(length + 1)
+    user32.GetWindowTextW(hwnd, buffer, length + 1)
+    return buffer.value
+
+
+class ForegroundTracker(object):
+    """
+    Keeps a snapshot of the foreground window (hwnd, pid, exe path, title).
+
+    A WinEvent hook on EVENT_SYSTEM_FOREGROUND (and title changes of the
+    foreground window) refreshes it, so reading `snapshot` costs nothing.
+    Title changes are only hooked in the foreground process, the hook moves
+    with the focus: a global EVENT_OBJECT_NAMECHANGE hook would wake us up
+    for every name change of every process. Exe paths come from the shared
+    processCache.
+    """
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self.snapshot = NO_WINDOW
+        self._lock = Lock()
+        self._thread = None
+        self._thread_id = None
+        self._proc = None
+        self._name_hook = None      # EVENT_OBJECT_NAMECHANGE hook of the foreground process, tracker thread only
+        self._name_hook_pid = None
+
+    def refresh(self, hwnd=None):
+        """ Rebuild the snapshot from `hwnd` (or the current foreground window) """
+        if hwnd is None:
+            hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            snapshot = NO_WINDOW
+        else:
+            pid = wintypes.DWORD()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            snapshot = ForegroundWindow(hwnd, pid.value, processCache.exe(pid.value), getWindowTitle(hwnd))
+
+        with self._lock:
+            changed = snapshot != self.snapshot
+            self.snapshot = snapshot
+        if changed and self.on_change:
+            self.on_change(snapshot)
+        return snapshot
+
+    def _on_win_event(self, hook, event, hwnd, id_object, id_child, thread_id, timestamp):
+        if event == EVENT_SYSTEM_FOREGROUND:
+            self._hook_name_changes(self.refresh(hwnd).pid)
+        elif event == EVENT_OBJECT_NAMECHANGE and id_object == OBJID_WINDOW and hwnd == self.snapshot.hwnd:
+            self.refresh(hwnd)
+
+    def _hook_name_changes(self, pid):
+        """ Move the title change hook to process `pid`, runs on the tracker thread whose message loop delivers it """
+        if pid == self._name_hook_pid:
+            return
+        if self._name_hook:
+            user32.UnhookWinEvent(self._name_hook)
+        self._name_hook = user32.SetWinEventHook(EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE, None, self._proc,
+                                                 pid, 0, WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS) if pid else None
+        self._name_hook_pid = pid
+
+    def _run(self):
+        self._thread_id = kernel32.GetCurrentThreadId()
+        # keep a reference, the hooks hold on to this pointer
+        self._proc = WinEventProc(self._on_win_event)
+        hook = user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, None, self._proc, 0, 0,
+                                      WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+        self._hook_name_changes(self.refresh().pid)
+
+        # hooks are delivered through this thread's message loop
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        for hook in (hook, self._name_hook):
+            if hook:
+                user32.UnhookWinEvent(hook)
+        self._name_hook = self._name_hook_pid = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="ForegroundTracker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None and self._thread_id:
+            user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread = None
+
+
+foregroundTracker = ForegroundTracker()
@@ -0,0 +1,71 @@
+import re
+from fnmatch import translate
+from logging import getLogger
+
+log = getLogger(__name__)
+
+GLOB_CHARS = frozenset("*?[")
+REGEX_PREFIX = "re:"
+
+
+class IgnoreList(object):
+    """
+    Parsed "Audio process ignore list" setting.
+
+    Entries are separated by commas and compared case-insensitively against the
+    whole process name. Plain names go into a frozenset, entries with glob
+    characters ("steam*.exe") and "re:" entries ("re:^nvidia.*") are compiled
+    one by one and have to match the whole name. `name in ignoreList` is a set
+    lookup, pattern results are memoised per name. Entries that don't compile
+    are logged and skipped.
+    """
+
+    def __init__(self, names=(), patterns=()):
+        self.names = frozenset(names)
+        self.patterns = tuple(patterns)
+        # compiled separately, inline flags, named groups and backreferences of one entry can't clash with another's
+        self._regexes = tuple(re.compile(p, re.IGNORECASE) for p in self.patterns)
+        self._matches = {}  # lowercased name -> bool, only used with patterns
+
+    @classmethod
+    def parse(cls, text):
+        names, patterns = set(), []
+        for entry in (text or "").split(","):
+            if not (entry := entry.strip()):
+                continue
+            if entry[:len(REGEX_PREFIX)].lower() == REGEX_PREFIX:
+                pattern = entry[len(REGEX_PREFIX):].strip()
+            elif GLOB_CHARS.intersection(entry):
+                pattern = translate(entry.lower())
+            else:
+                names.add(entry.lower())
+                continue
+            try:
+                re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                log.warning(f"Ignoring invalid ignore list entry {entry!r}: {e}")
+                continue
+            patterns.append(pattern)
+        return cls(names, patterns)
+
+    def __contains__(self, name):
+        name = name.lower()
+        if name in self.names:
+            return True
+        if not self._regexes:
+            return False
+        if (matched := self._matches.get(name)) is None:
+            matched = self._matches[name] = any(regex.fullmatch(name) for regex in self._regexes)
+        return matched
+
+    def __bool__(self):
+        return bool(self.names or self.patterns)
+
+    def __eq__(self, other):
+        return isinstance(other, IgnoreList) and (self.names, self.patterns) == (other.names, other.patterns)
+
+    def __hash__(self):
+        return hash((self.names, self.patterns))
+
+    def __repr__(self):
+        return f"IgnoreList({sorted(self.names)}, {list(self.patterns)})"
@@ -0,0 +1,204 @@
+import json
+import os
+from collections import namedtuple
+from logging import getLogger
+from threading import Lock
+
+from .backend import DEVICE_STATE_ACTIVE, EDataFlow, getBackend
+from .sessionRegistry import sessionRegistry
+
+log = getLogger(__name__)
+
+FLOWS = (EDataFlow.eRender.value, EDataFlow.eCapture.value)
+
+AppState = namedtuple("AppState", ["volume", "muted", "routing"])        # routing: {flow: device id}, default devices left out
+DeviceState = namedtuple("DeviceState", ["flow", "volume", "muted"])
+
+
+class MixerScene(object):
+    """ Volume, mute and routing of every app and the volume and mute of every endpoint """
+    __slots__ = ("apps", "devices")
+
+    def __init__(self, apps=None, devices=None):
+        self.apps = apps or {}        # app name -> AppState
+        self.devices = devices or {}  # device id -> DeviceState
+
+    def to_json(self):
+        """ Lists instead of objects and 3 decimals, a scene of 30 apps stays around 1 KB """
+        apps = {}
+        for name, state in self.apps.items():
+            entry = [round(state.volume, 3), int(state.muted)]
+            if state.routing:
+                entry.append({str(flow): device_id for flow, device_id in state.routing.items()})
+            apps[name] = entry
+        return {"apps": apps,
+                "devices": {device_id: [state.flow, round(state.volume, 3), int(state.muted)]
+                            for device_id, state in self.devices.items()}}
+
+    @classmethod
+    def from_json(cls, data):
+        apps = {name: AppState(float(entry[0]), bool(entry[1]),
+                               {int(flow): device_id for flow, device_id in (entry[2] if len(entry) > 2 else {}).items()})
+                for name, entry in data.get("apps", {}).items()}
+        devices = {device_id: DeviceState(int(entry[0]), float(entry[1]), bool(entry[2]))
+                   for device_id, entry in data.get("devices", {}).items()}
+        return cls(apps, devices)
+
+    @classmethod
+    def capture(cls, backend=None):
+        """ The scene as it is right now, read in one backend call """
+        backend = backend or getBackend()
+        return backend.call(cls._capture, backend)
+
+    @classmethod
+    def _capture(cls, backend):
+        apps = {}
+        for name in sessionRegistry.names():
+            if (app := sessionRegistry.app(name)) is None:
+                continue
+            try:
+                pid = app.pids()[0]
+                routing = {flow: device_id for flow in FLOWS if (device_id := backend.application_endpoint(flow, pid))}
+                apps[name] = AppState(app.volume(), app.muted(), routing)
+            except Exception as e:
+                # the session went away while we were reading it
+                log.debug(f"Could not capture {name}: {e}")
+
+        devices = {}
+        for flow in FLOWS:
+            for device_id, _ in backend.enumerate_devices(flow, DEVICE_STATE_ACTIVE):
+                try:
+                    if (volume := backend.endpoint_volume(device_id, flow)) is not None:
+                        devices[device_id] = DeviceState(flow, volume.GetMasterVolumeLevelScalar(), bool(volume.GetMute()))
+                except Exception as e:
+                    log.debug(f"Could not capture {device_id}: {e}")
+        return cls(apps, devices)
+
+
+class SceneTransition(object):
+    """
+    Moves every app and device of a scene from where it is now to the scene.
+
+    The targets are looked up once, when the transition is created: one pass
+    over the registered sessions and one endpoint lookup per device, however
+    many steps follow. `apply(progress)` (0.0-1.0) writes every target in a
+    single backend call, so a crossfade is one FadeEngine ramp instead of one
+    per target. Routing and unmutes are applied on the first step, mutes on
+    the last one so a fade out can be heard. Apps of the scene that are not
+    running and devices that are gone are left out.
+    """
+
+    def __init__(self, scene, backend=None):
+        self.scene = scene
+        self._backend = backend or getBackend()
+        self._started = False
+        self._apps, self._devices = self._backend.call(self._resolve)
+
+    @property
+    def app_names(self):
+        return [app.name for app, _, _, _ in self._apps]
+
+    @property
+    def device_ids(self):
+        return [(state.flow, device_id) for device_id, _, _, _, state in self._devices]
+
+    def _resolve(self):
+        apps = []     # (AppSessions, start volume, muted now, AppState)
+        for name, state in self.scene.apps.items():
+            if (app := sessionRegistry.app(name)) is not None:
+                try:
+                    apps.append((app, app.volume(), app.muted(), state))
+                except Exception as e:
+                    log.debug(f"Could not read {name}: {e}")
+
+        devices = []  # (device id, endpoint volume, start volume, muted now, DeviceState)
+        for device_id, state in self.scene.devices.items():
+            try:
+                if (volume := self._backend.endpoint_volume(device_id, state.flow)) is not None:
+                    devices.append((device_id, volume, volume.GetMasterVolumeLevelScalar(), bool(volume.GetMute()), state))
+            except Exception as e:
+                log.debug(f"Could not read {device_id}: {e}")
+        return apps, devices
+
+    def apply(self, progress):
+        self._backend.call(self._apply, min(1.0, max(0.0, progress)))
+
+    def _apply(self, progress):
+        first, last = not self._started, progress >= 1.0
+        self._started = True
+        for app, start, muted, state in self._apps:
+            try:
+                if first:
+                    self._route(app, state.routing)
+                    if muted and not state.muted:
+                        app.set_mute(False)
+                app.set_volume(start + (state.volume - start) * progress)
+                if last and state.muted and not muted:
+                    app.set_mute(True)
+            except Exception as e:
+                log.debug(f"Could not restore {app.name}: {e}")
+
+        for device_id, volume, start, muted, state in self._devices:
+            try:
+                if first and muted and not state.muted:
+                    volume.SetMute(0, None)
+                volume.SetMasterVolumeLevelScalar(start + (state.volume - start) * progress, None)
+                if last and state.muted and not muted:
+                    volume.SetMute(1, None)
+            except Exception as e:
+                log.debug(f"Could not restore {device_id}: {e}")
+
+    def _route(self, app, routing):
+        for pid in app.pids():
+            for flow in FLOWS:
+                if self._backend.application_endpoint(flow, pid) != (device_id := routing.get(flow, "")):
+                    self._backend.set_application_endpoint(device_id, flow, pid)
+
+
+class SceneStore(object):
+    """ Named MixerScenes in one compact JSON file, read on first use and rewritten on every change """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._scenes = None  # name -> MixerScene
+
+    def _load(self):
+        if self._scenes is None:
+            self._scenes = {}
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self._scenes = {name: MixerScene.from_json(scene) for name, scene in data.get("scenes", {}).items()}
+            except FileNotFoundError:
+                pass
+            except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+                log.warning(f"Could not read scenes from {self.path}: {e}")
+        return self._scenes
+
+    def _write(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "scenes": {name: scene.to_json() for name, scene in self._scenes.items()}},
+                      f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def names(self):
+        with self._lock:
+            return list(self._load())
+
+    def get(self, name):
+        with self._lock:
+            return self._load().get(name)
+
+    def save(self, name, scene):
+        with self._lock:
+            self._load()[name] = scene
+            self._write()
+
+    def delete(self, name):
+        with self._lock:
+            if self._load().pop(name, None) is None:
+                return False
+            self._write()
+            return True
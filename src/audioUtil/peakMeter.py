@@ -0,0 +1,117 @@
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic
+
+from .backend import getBackend
+
+log = getLogger(__name__)
+
+MAX_RATE = 30.0  # Hz, more than Touch Portal can show anyway
+
+
+def readPeak(meter):
+    """ GetPeakValue of `meter`, 0.0 when there is none or it is gone already """
+    if meter is None:
+        return 0.0
+    try:
+        return meter.GetPeakValue()
+    except Exception:
+        return 0.0
+
+
+class PeakMeterSampler(object):
+    """
+    Samples peak meters from a single thread, `rate` times per second.
+
+    Every pass runs `read()` in one backend call, so all the meters of a pass
+    cost one hop to the audio thread no matter how many sessions there are.
+    `read` returns {key: peak 0.0 - 1.0}. Peaks are quantised to `step`
+    percent and only the levels that changed since the previous pass are
+    handed to `publish({key: level})`. Keys that are missing from a pass are
+    forgotten, and `forget(key)` makes the next pass publish a key again even
+    when its level did not change. A rate of 0 stops sampling and drops every
+    level back to 0.
+    """
+
+    def __init__(self, read, publish, rate=0.0, step=5, backend=None):
+        self.read = read
+        self.publish = publish
+        self.step = step
+        self.passes = 0
+        self.overruns = 0
+        self._backend = backend or getBackend()
+        self._cond = Condition()
+        self._rate = 0.0
+        self._levels = {}  # key -> level published last
+        self._thread = None
+        self.set_rate(rate)
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        with self._cond:
+            self._rate = min(MAX_RATE, max(0.0, float(rate)))
+            if self._rate and self._thread is None:
+                self._thread = Thread(target=self._run, name="PeakMeterSampler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        self.set_rate(0)
+
+    def forget(self, key):
+        """ The level published last for `key` is no longer what is shown """
+        with self._cond:
+            self._levels.pop(key, None)
+
+    def quantise(self, peak):
+        return min(100, max(0, int(round(peak * 100 / self.step)) * self.step))
+
+    def sample(self):
+        """ One pass over every meter, returns the levels that changed """
+        try:
+            peaks = self._backend.call(self.read)
+        except Exception as e:
+            log.debug(f"Could not read peak meters: {e}")
+            return {}
+        levels = {key: self.quantise(peak) for key, peak in peaks.items()}
+        with self._cond:
+            changed = {key: level for key, level in levels.items() if self._levels.get(key) != level}
+            self._levels = levels
+        self.passes += 1
+        if changed:
+            self.publish(changed)
+        return changed
+
+    def _silence(self):
+        if (levels := {key: 0 for key, level in self._levels.items() if level}):
+            self.publish(levels)
+        self._levels = {}
+
+    def _run(self):
+        next_due = monotonic()
+        while True:
+            with self._cond:
+                if not self._rate:
+                    self._silence()
+                    while not self._rate:
+                        self._cond.wait()
+                    next_due = monotonic()
+                interval = 1.0 / self._rate
+                if (wait := next_due - monotonic()) > 0:
+                    # woken early when the rate changes
+                    self._cond.wait(wait)
+                    continue
+
+            try:
+                self.sample()
+            except Exception as e:
+                log.warning(f"peak meter pass failed: {e}")
+
+            next_due += interval
+            if next_due < monotonic():
+                # the pass took longer than the interval, skip the missed ones
+                self.overruns += 1
+                next_due = monotonic() + interval
@@ -0,0 +1,149 @@
+import os
+import sys
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+import psutil
+
+ProcessIdentity = namedtuple("ProcessIdentity", ["pid", "create_time", "name", "exe", "ppid"])
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    SYNCHRONIZE = 0x00100000
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    WAIT_OBJECT_0 = 0
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.WaitForSingleObject.argtypes = (wintypes.HANDLE, wintypes.DWORD)
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+
+    def pinProcess(pid):
+        """ An open handle keeps Windows from handing the pid to another process """
+        return kernel32.OpenProcess(SYNCHRONIZE | PROCESS_QUERY_LIMITED_INFORMATION, False, pid) or None
+
+    def hasExited(pin):
+        return kernel32.WaitForSingleObject(pin, 0) == WAIT_OBJECT_0
+
+    def unpinProcess(pin):
+        kernel32.CloseHandle(pin)
+else:
+    def pinProcess(pid):
+        return None
+
+    def hasExited(pin):
+        return False
+
+    def unpinProcess(pin):
+        pass
+
+
+class ProcessCache(object):
+    """
+    (pid, create time) -> name, exe path and parent pid, bounded LRU.
+
+    On Windows every entry holds a process handle, so its pid can't be reused
+    while it is cached and a repeated lookup is a dict hit. `prune` drops the
+    entries of processes that exited. Where a process can't be opened (or off
+    Windows) every hit compares the create time of the pid with the cached
+    one, a single cheap call, so a reused pid never returns the previous
+    owner. `forget` a pid as soon as its process is known to be gone (its last
+    audio session expired).
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self._entries = OrderedDict()  # pid -> (ProcessIdentity, pin)
+        self.hits = 0
+        self.misses = 0
+
+    def identity(self, pid):
+        """ ProcessIdentity of `pid`, None if there is no such process """
+        if not pid:
+            return None
+        with self._lock:
+            entry = self._entries.get(pid)
+        if entry is not None:
+            identity, pin = entry
+            if pin is not None or self._create_time(pid) == identity.create_time:
+                with self._lock:
+                    if pid in self._entries:
+                        self._entries.move_to_end(pid)
+                    self.hits += 1
+                return identity
+
+        # pin before reading, everything read after belongs to the process the pin holds on to
+        pin = pinProcess(pid)
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                create_time = process.create_time()
+                name = process.name()
+                ppid = process.ppid()
+                try:
+                    exe = process.exe()
+                except (psutil.AccessDenied, OSError):
+                    exe = ""
+        except (psutil.Error, OSError):
+            if pin is not None:
+                unpinProcess(pin)
+            self.forget(pid)
+            return None
+
+        identity = ProcessIdentity(pid, create_time, name or os.path.basename(exe), exe, ppid)
+        evicted = []
+        with self._lock:
+            self.misses += 1
+            if (old := self._entries.pop(pid, None)) is not None:
+                evicted.append(old)
+            self._entries[pid] = (identity, pin)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for _, old_pin in evicted:
+            if old_pin is not None:
+                unpinProcess(old_pin)
+        return identity
+
+    def name(self, pid):
+        identity = self.identity(pid)
+        return identity.name if identity else ""
+
+    def exe(self, pid):
+        identity = self.identity(pid)
+        return identity.exe if identity else ""
+
+    @staticmethod
+    def _create_time(pid):
+        try:
+            return psutil.Process(pid).create_time()
+        except (psutil.Error, OSError):
+            return None
+
+    def forget(self, pid):
+        with self._lock:
+            entry = self._entries.pop(pid, None)
+        if entry is not None and entry[1] is not None:
+            unpinProcess(entry[1])
+
+    def prune(self):
+        """ Drop the processes that exited, returns how many """
+        with self._lock:
+            exited = [pid for pid, (_, pin) in self._entries.items() if pin is not None and hasExited(pin)]
+            pins = [self._entries.pop(pid)[1] for pid in exited]
+        for pin in pins:
+            unpinProcess(pin)
+        return len(pins)
+
+    def clear(self):
+        with self._lock:
+            entries, self._entries = self._entries, OrderedDict()
+        for _, pin in entries.values():
+            if pin is not None:
+                unpinProcess(pin)
+
+
+processCache = ProcessCache()
@@ -0,0 +1,180 @@
+from threading import Lock
+
+from .backend import getBackend
+
+
+class RegisteredSession(object):
+    """ One audio session as seen by the registry """
+    __slots__ = ("key", "name", "pid", "SimpleAudioVolume", "meter")
+
+    def __init__(self, key, name, pid, simpleAudioVolume, meter=None):
+        self.key = key
+        self.name = name
+        self.pid = pid
+        self.SimpleAudioVolume = simpleAudioVolume
+        self.meter = meter  # IAudioMeterInformation-like (GetPeakValue), None if the backend has none
+
+
+class AppSessions(object):
+    """
+    Every live session of one executable, as one app.
+
+    Browsers, games and chat apps often own several sessions. The app's volume
+    is the loudest of them and it counts as muted only when all of them are.
+    Reads and writes cover every session in a single backend call.
+    """
+    __slots__ = ("name", "sessions")
+
+    def __init__(self, name, sessions):
+        self.name = name
+        self.sessions = tuple(sessions)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def pids(self):
+        return list(dict.fromkeys(session.pid for session in self.sessions))
+
+    def _volume(self):
+        return max(session.SimpleAudioVolume.GetMasterVolume() for session in self.sessions)
+
+    def _set_volume(self, volume):
+        for session in self.sessions:
+            session.SimpleAudioVolume.SetMasterVolume(volume, None)
+        return volume
+
+    def _muted(self):
+        return all(session.SimpleAudioVolume.GetMute() for session in self.sessions)
+
+    def _set_mute(self, muted):
+        for session in self.sessions:
+            session.SimpleAudioVolume.SetMute(1 if muted else 0, None)
+        return muted
+
+    def volume(self):
+        return getBackend().call(self._volume)
+
+    def set_volume(self, volume):
+        return getBackend().call(self._set_volume, min(1.0, max(0.0, volume)))
+
+    def adjust_volume(self, delta):
+        """ Move the app's volume by `delta`, returns the new volume """
+        return getBackend().call(lambda: self._set_volume(min(1.0, max(0.0, self._volume() + delta))))
+
+    def muted(self):
+        return getBackend().call(self._muted)
+
+    def set_mute(self, muted):
+        return getBackend().call(self._set_mute, muted)
+
+    def toggle_mute(self):
+        """ Unmute every session if all of them are muted, mute them all otherwise, returns the new mute """
+        return getBackend().call(lambda: self._set_mute(not self._muted()))
+
+
+class SessionRegistry(object):
+    """
+    Index of the live audio sessions keyed by process name and pid.
+
+    The registry is kept current by the backend's session callbacks
+    (`add` when a session shows up, `remove` when it expires) so lookups
+    never have to enumerate sessions. `resync` rebuilds it from scratch.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._sessions = {}     # key -> RegisteredSession
+        self._by_name = {}      # name -> {key: RegisteredSession}
+        self._by_pid = {}       # pid -> {key: RegisteredSession}
+        self._synced = False
+
+    def _insert(self, session):
+        self._discard(session.key)
+        self._sessions[session.key] = session
+        self._by_name.setdefault(session.name, {})[session.key] = session
+        self._by_pid.setdefault(session.pid, {})[session.key] = session
+
+    def _discard(self, key):
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return None
+        for index, field in ((self._by_name, session.name), (self._by_pid, session.pid)):
+            bucket = index.get(field)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del index[field]
+        return session
+
+    def add(self, session):
+        """ Called from the session callback when a session is created """
+        with self._lock:
+            self._insert(session)
+        return session
+
+    def remove(self, session):
+        """ Called from the session callback when a session expires """
+        with self._lock:
+            return self._discard(session.key)
+
+    def resync(self):
+        """ Rebuild the whole index from the backend """
+        sessions = getBackend().enumerate_sessions()
+        with self._lock:
+            self._sessions.clear()
+            self._by_name.clear()
+            self._by_pid.clear()
+            for session in sessions:
+                self._insert(session)
+            self._synced = True
+
+    def _ensure_synced(self):
+        if not self._synced:
+            self.resync()
+
+    def app(self, name):
+        """ AppSessions of the process `name`, None if it has no session """
+        self._ensure_synced()
+        with self._lock:
+            if (bucket := self._by_name.get(name)):
+                return AppSessions(name, bucket.values())
+        return None
+
+    def count(self, name):
+        """ number of live sessions owned by `name` """
+        with self._lock:
+            return len(self._by_name.get(name, ()))
+
+    def sessions(self, name):
+        """ All sessions owned by the process `name` """
+        self._ensure_synced()
+        with self._lock:
+            return list(self._by_name.get(name, {}).values())
+
+    def sessions_by_pid(self, pid):
+        self._ensure_synced()
+        with self._lock:
+            return list(self._by_pid.get(pid, {}).values())
+
+    def process_ids(self, name):
+        """ pids of every process named `name` that has a session, oldest session first """
+        self._ensure_synced()
+        with self._lock:
+            return list(dict.fromkeys(session.pid for session in self._by_name.get(name, {}).values()))
+
+    def process_id(self, name):
+        """ pid of the oldest session owned by `name`, or None """
+        self._ensure_synced()
+        with self._lock:
+            bucket = self._by_name.get(name)
+            if bucket:
+                return next(iter(bucket.values())).pid
+        return None
+
+    def names(self):
+        self._ensure_synced()
+        with self._lock:
+            return list(self._by_name.keys())
+
+
+sessionRegistry = SessionRegistry()
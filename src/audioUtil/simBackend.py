@@ -0,0 +1,347 @@
+from collections import Counter
+from itertools import count
+from threading import RLock
+from time import perf_counter_ns, sleep
+
+from .backend import (DEVICE_STATE_ACTIVE, NO_WINDOW, AudioBackend,
+                      AudioSessionState, EDataFlow, ERole, ForegroundWindow)
+from .sessionRegistry import RegisteredSession
+
+DEVICE_STATE_DISABLED = 0x00000002
+DEVICE_STATE_NOTPRESENT = 0x00000004
+DEVICE_STATE_UNPLUGGED = 0x00000008
+
+
+class SimulatedSimpleAudioVolume(object):
+    """ ISimpleAudioVolume of a simulated session """
+
+    def __init__(self, backend, session):
+        self._backend = backend
+        self._session = session
+
+    def GetMasterVolume(self):
+        self._backend._call("GetMasterVolume")
+        return self._session.volume
+
+    def SetMasterVolume(self, level, context):
+        self._backend._call("SetMasterVolume")
+        self._backend.set_session_volume(self._session.key, level)
+
+    def GetMute(self):
+        self._backend._call("GetMute")
+        return int(self._session.mute)
+
+    def SetMute(self, mute, context):
+        self._backend._call("SetMute")
+        self._backend.set_session_mute(self._session.key, mute)
+
+
+class SimulatedEndpointVolume(object):
+    """ IAudioEndpointVolume of a simulated endpoint """
+
+    def __init__(self, backend, device):
+        self._backend = backend
+        self._device = device
+
+    def GetMasterVolumeLevelScalar(self):
+        self._backend._call("GetMasterVolumeLevelScalar")
+        return self._device.volume
+
+    def SetMasterVolumeLevelScalar(self, level, context):
+        self._backend._call("SetMasterVolumeLevelScalar")
+        self._backend.set_device_volume(self._device.id, level)
+
+    def GetMute(self):
+        self._backend._call("GetMute")
+        return int(self._device.mute)
+
+    def SetMute(self, mute, context):
+        self._backend._call("SetMute")
+        self._backend.set_device_volume(self._device.id, mute=mute)
+
+
+class SimulatedMeter(object):
+    """ IAudioMeterInformation of a simulated session or endpoint, the peak is whatever was scripted last """
+
+    def __init__(self, backend, target):
+        self._backend = backend
+        self._target = target
+
+    def GetPeakValue(self):
+        self._backend._call("GetPeakValue")
+        return self._target.peak
+
+
+class SimulatedSession(object):
+    def __init__(self, backend, key, name, pid, volume, mute, state):
+        self.key = key
+        self.name = name
+        self.pid = pid
+        self.volume = volume
+        self.mute = mute
+        self.state = state
+        self.peak = 0.0
+        self.SimpleAudioVolume = SimulatedSimpleAudioVolume(backend, self)
+        self.meter = SimulatedMeter(backend, self)
+        self.listener = None
+
+    def registered(self):
+        return RegisteredSession(self.key, self.name, self.pid, self.SimpleAudioVolume, self.meter)
+
+
+class SimulatedDevice(object):
+    def __init__(self, device_id, name, flow, state=DEVICE_STATE_ACTIVE, volume=1.0):
+        self.id = device_id
+        self.name = name
+        self.flow = flow
+        self.state = state
+        self.volume = volume
+        self.mute = False
+        self.peak = 0.0
+        self.watchers = []  # endpoint volume callbacks
+
+
+class SimulatedForeground(object):
+    """ Same surface as the ForegroundTracker, the window is whatever `focus` said last """
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self.snapshot = NO_WINDOW
+
+    def focus(self, exe, title="", pid=0, hwnd=1):
+        snapshot = ForegroundWindow(hwnd, pid, exe, title) if exe else NO_WINDOW
+        changed = snapshot != self.snapshot
+        self.snapshot = snapshot
+        if changed and self.on_change:
+            self.on_change(snapshot)
+        return snapshot
+
+    def refresh(self, hwnd=None):
+        return self.snapshot
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class SimulatedAudioBackend(AudioBackend):
+    """
+    In-memory Windows audio graph: sessions, render/capture endpoints, default
+    devices per role, per-app routing and the focused window.
+
+    Session callbacks and device notifications fire synchronously from the
+    scripting calls (`add_session`, `set_session_volume`, `remove_device`, ...),
+    `latency` seconds are slept on every interface call to mimic COM round trips
+    and `calls` counts them by method name.
+    """
+    name = "simulated"
+
+    def __init__(self, sessions=0, devices=0, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.routing = {}           # (pid, flow) -> device id
+        self._lock = RLock()
+        self._ids = count(1)
+        self._sessions = {}         # key -> SimulatedSession
+        self._devices = {}          # device id -> SimulatedDevice
+        self._defaults = {}         # (flow, role) -> device id
+        self._listener_factory = None
+        self._notifier = None
+        self._foreground = SimulatedForeground()
+
+        for i in range(devices):
+            self.add_device(f"Speakers {i}", EDataFlow.eRender.value)
+            self.add_device(f"Microphone {i}", EDataFlow.eCapture.value)
+        for i in range(sessions):
+            self.add_session(f"app{i}.exe")
+
+    def _call(self, method):
+        self.calls[method] += 1
+        if self.latency:
+            start = perf_counter_ns()
+            sleep(self.latency)
+            if (observer := self.call_observer) is not None:
+                observer(method, perf_counter_ns() - start)
+        elif (observer := self.call_observer) is not None:
+            observer(method, 0)
+
+    # ---- scripting
+    def add_session(self, name, pid=None, volume=1.0, mute=False, state=AudioSessionState.Active):
+        with self._lock:
+            n = next(self._ids)
+            session = SimulatedSession(self, f"sim|{name}|{n}", name, n if pid is None else pid,
+                                       volume, mute, AudioSessionState(state))
+            self._sessions[session.key] = session
+            factory = self._listener_factory
+        if factory is not None:
+            session.listener = factory(session.registered(), session.volume, session.mute, session.state)
+        return session.key
+
+    def set_session_volume(self, key, volume):
+        session = self._sessions[key]
+        if session.volume != volume:
+            session.volume = volume
+            if session.listener is not None:
+                session.listener.update_volume(volume)
+
+    def set_session_mute(self, key, mute):
+        session = self._sessions[key]
+        if session.mute != bool(mute):
+            session.mute = bool(mute)
+            if session.listener is not None:
+                session.listener.update_mute(session.mute)
+
+    def set_session_peak(self, key, peak):
+        """ What the session's meter reads from now on, 0.0 - 1.0 """
+        self._sessions[key].peak = float(peak)
+
+    def set_session_state(self, key, state):
+        state = AudioSessionState(state)
+        with self._lock:
+            session = self._sessions[key]
+            session.state = state
+            if state == AudioSessionState.Expired:
+                del self._sessions[key]
+        if session.listener is not None:
+            session.listener.update_state(state)
+
+    def expire_session(self, key):
+        self.set_session_state(key, AudioSessionState.Expired)
+
+    def session_keys(self, name=None):
+        return [key for key, session in list(self._sessions.items()) if name is None or session.name == name]
+
+    def add_device(self, name, flow, state=DEVICE_STATE_ACTIVE, volume=1.0):
+        with self._lock:
+            device = SimulatedDevice(f"{{0.0.{flow}.00000000}}.{{sim-{next(self._ids)}}}", name, flow, state, volume)
+            self._devices[device.id] = device
+            # the first active endpoint of a flow becomes its default for every role
+            for role in ERole:
+                if state == DEVICE_STATE_ACTIVE and (flow, role.value) not in self._defaults:
+                    self._defaults[(flow, role.value)] = device.id
+        self._devices_changed(device.id)
+        return device.id
+
+    def set_device_volume(self, device_id, volume=None, mute=None):
+        """ Change an endpoint's volume and/or mute, like the Windows volume flyout would """
+        device = self._devices[device_id]
+        with self._lock:
+            if volume is not None:
+                device.volume = min(1.0, max(0.0, float(volume)))
+            if mute is not None:
+                device.mute = bool(mute)
+            watchers = list(device.watchers)
+        for callback in watchers:
+            callback(device.volume, device.mute)
+
+    def set_device_peak(self, device_id, peak):
+        """ What the endpoint's meter reads from now on, 0.0 - 1.0 """
+        self._devices[device_id].peak = float(peak)
+
+    def set_device_state(self, device_id, state):
+        self._devices[device_id].state = state
+        self._devices_changed(device_id)
+
+    def remove_device(self, device_id):
+        with self._lock:
+            device = self._devices.pop(device_id)
+            for key, default in list(self._defaults.items()):
+                if default == device_id:
+                    del self._defaults[key]
+        self._devices_changed(device_id)
+        return device
+
+    def _devices_changed(self, device_id):
+        if self._notifier is not None:
+            self._notifier.devices_changed(device_id)
+
+    def focus(self, exe, title="", pid=0):
+        return self._foreground.focus(exe, title, pid)
+
+    # ---- AudioBackend
+    def enumerate_sessions(self):
+        self._call("GetAllSessions")
+        with self._lock:
+            return [session.registered() for session in self._sessions.values()]
+
+    def watch_sessions(self, listener_factory):
+        self._call("RegisterSessionNotification")
+        with self._lock:
+            self._listener_factory = listener_factory
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.listener = listener_factory(session.registered(), session.volume, session.mute, session.state)
+
+    def enumerate_devices(self, flow, state=DEVICE_STATE_ACTIVE):
+        self._call("EnumAudioEndpoints")
+        with self._lock:
+            return [(device.id, device.name) for device in self._devices.values()
+                    if (flow == EDataFlow.eAll.value or device.flow == flow) and device.state & state]
+
+    def default_device_id(self, flow, role):
+        self._call("GetDefaultAudioEndpoint")
+        return self._defaults.get((flow, role), "")
+
+    def device_name(self, device_id):
+        self._call("OpenPropertyStore")
+        device = self._devices.get(device_id)
+        return device.name if device else None
+
+    def set_default_device(self, device_id, role):
+        self._call("SetDefaultEndpoint")
+        device = self._devices[device_id]
+        self._defaults[(device.flow, role)] = device_id
+        if self._notifier is not None:
+            self._notifier.default_changed(device.flow, role, device_id)
+
+    def endpoint_volume(self, device_id, flow):
+        self._call("Activate")
+        if device_id == "default":
+            device_id = self._defaults.get((flow, ERole.eMultimedia.value), "")
+        device = self._devices.get(device_id)
+        return SimulatedEndpointVolume(self, device) if device else None
+
+    def endpoint_meter(self, device_id, flow):
+        self._call("Activate")
+        if device_id == "default":
+            device_id = self._defaults.get((flow, ERole.eMultimedia.value), "")
+        device = self._devices.get(device_id)
+        return SimulatedMeter(self, device) if device else None
+
+    def watch_endpoint_volume(self, device_id, flow, callback):
+        self._call("RegisterControlChangeNotify")
+        if (device := self._devices.get(device_id)) is None:
+            return None
+        with self._lock:
+            device.watchers.append(callback)
+        return (device, callback)
+
+    def unwatch_endpoint_volume(self, token):
+        self._call("UnregisterControlChangeNotify")
+        device, callback = token
+        with self._lock:
+            if callback in device.watchers:
+                device.watchers.remove(callback)
+
+    def set_application_endpoint(self, device_id, flow, pid):
+        self._call("SetApplicationEndpoint")
+        if device_id:
+            self.routing[(pid, flow)] = device_id
+        else:
+            self.routing.pop((pid, flow), None)
+
+    def application_endpoint(self, flow, pid):
+        return self.routing.get((pid, flow), "")
+
+    def start_notifications(self, notifier):
+        self._call("RegisterEndpointNotificationCallback")
+        self._notifier = notifier
+
+    def stop_notifications(self):
+        self._call("UnregisterEndpointNotificationCallback")
+        self._notifier = None
+
+    def foreground(self):
+        return self._foreground
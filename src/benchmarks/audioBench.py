@@ -0,0 +1,118 @@
+"""
+Microbenchmarks of the audioUtil operations the plugin actions run.
+
+Runs against the simulated audio backend so the numbers are comparable
+between machines and before/after a change:
+
+    python -m benchmarks.audioBench --sessions 50 --devices 4
+    python -m benchmarks.audioBench --update-baseline
+
+Exits with 1 when a case regressed past benchmarks/baselines.json.
+"""
+import os
+import sys
+from argparse import ArgumentParser
+from itertools import cycle
+
+from audioUtil import audioSwitch
+from audioUtil.audioController import (get_process_id, muteAndUnMute,
+                                       setDeviceVolume, volumeChanger)
+from audioUtil.backend import EDataFlow, ERole, setBackend
+from audioUtil.deviceNotifier import deviceNotifier
+from audioUtil.sessionRegistry import sessionRegistry
+from audioUtil.simBackend import SimulatedAudioBackend
+
+from .harness import (compare, formatTable, loadBaselines, measure,
+                      saveBaselines)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+def getDevicebydata(edata, erole):
+    """ same as TPAudioMixer.getDevicebydata, which can't be imported without a TP client """
+    return audioSwitch.getDefaultDevice(edata, erole)[1]
+
+
+def buildCases(backend, app):
+    outputs = list(audioSwitch.MyAudioUtilities.getAllDevices("Output").values())
+    nextOutput = cycle(outputs).__next__
+    levels = cycle(range(0, 101, 7)).__next__
+
+    def coldDeviceList():
+        audioSwitch.deviceCatalog.invalidate()
+        return audioSwitch.MyAudioUtilities.getAllDevices("Output")
+
+    return [
+        ("volumeChanger set", lambda: volumeChanger(app, "Set", levels())),
+        ("volumeChanger increase", lambda: volumeChanger(app, "Increase", 1)),
+        ("volumeChanger decrease", lambda: volumeChanger(app, "Decrease", 1)),
+        ("volumeChanger master", lambda: volumeChanger("Master Volume", "Set", levels())),
+        ("muteAndUnMute toggle", lambda: muteAndUnMute(app, "Toggle")),
+        ("get_process_id", lambda: get_process_id(app)),
+        ("get_process_id missing", lambda: get_process_id("missing.exe")),
+        ("getAllDevices", lambda: audioSwitch.MyAudioUtilities.getAllDevices("Output")),
+        ("getAllDevices cold", coldDeviceList),
+        ("getDevicebydata", lambda: getDevicebydata(EDataFlow.eRender.value, ERole.eMultimedia.value)),
+        ("setDeviceVolume default", lambda: setDeviceVolume("default", "Output", levels())),
+        ("setDeviceVolume by id", lambda: setDeviceVolume(outputs[-1], "Output", levels())),
+        ("switchOutput", lambda: audioSwitch.switchOutput(nextOutput(), ERole.eMultimedia.value)),
+    ]
+
+
+def run(sessions, devices, latency=0.0, iterations=1000, only=None):
+    backend = setBackend(SimulatedAudioBackend(sessions=sessions, devices=max(2, devices), latency=latency))
+    audioSwitch.deviceCatalog.invalidate()
+    audioSwitch.startDeviceNotifications()
+    sessionRegistry.resync()
+
+    results = []
+    try:
+        for name, fn in buildCases(backend, "app0.exe"):
+            if only and only not in name:
+                continue
+            results.append(measure(name, fn, iterations=iterations,
+                                   call_counter=lambda: sum(backend.calls.values())))
+    finally:
+        audioSwitch.stopDeviceNotifications()
+    return results
+
+
+def configKey(sessions, devices, latency):
+    return f"sessions={sessions},devices={devices},latency={latency:g}"
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="audioUtil microbenchmarks")
+    parser.add_argument("--sessions", type=int, default=50, help="number of simulated audio sessions")
+    parser.add_argument("--devices", type=int, default=4, help="number of simulated endpoints per flow")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every simulated audio call takes")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--only", metavar="TEXT", help="only run cases whose name contains TEXT")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="allowed slowdown factor before failing")
+    opts = parser.parse_args(argv)
+
+    results = run(opts.sessions, opts.devices, opts.latency, opts.iterations, opts.only)
+    print(formatTable(results))
+
+    key = configKey(opts.sessions, opts.devices, opts.latency)
+    baselines = loadBaselines(opts.baseline)
+    if opts.update_baseline:
+        baselines.setdefault(key, {}).update({r.name: r.asdict() for r in results})
+        saveBaselines(opts.baseline, baselines)
+        print(f"baseline {key} written to {opts.baseline}")
+        return 0
+
+    stored = baselines.get(key, {})
+    if not stored:
+        print(f"no baseline for {key}, run with --update-baseline to create one")
+        return 0
+    regressions = [line for r in results for line in compare(r, stored.get(r.name), opts.tolerance)]
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import json
+import socket
+from threading import Condition, Thread
+from time import monotonic
+
+
+class FakeTouchPortal(object):
+    """
+    Stand-in for the Touch Portal desktop socket.
+
+    Listens on localhost, answers the plugin's "pair" with an "info" message and
+    records every message the plugin sends as (monotonic time, message).
+    `send` writes a message to the plugin the same way Touch Portal does.
+    """
+
+    def __init__(self, pluginId, settings=None, host="127.0.0.1", port=0):
+        self.pluginId = pluginId
+        self.settings = settings or []
+        self.received = []      # [(monotonic time, message)]
+        self._cond = Condition()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(1)
+        self.host, self.port = self._server.getsockname()
+        self._conn = None
+        self._thread = Thread(target=self._run, name="FakeTouchPortal", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._conn, _ = self._server.accept()
+        except OSError:
+            return
+        buffer = bytearray()
+        while True:
+            try:
+                data = self._conn.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            buffer += data
+            while (i := buffer.find(b'\n')) > -1:
+                line = bytes(buffer[:i])
+                del buffer[:i+1]
+                self._received(json.loads(line.decode()))
+        with self._cond:
+            self._conn = None
+            self._cond.notify_all()
+
+    def _received(self, message):
+        with self._cond:
+            self.received.append((monotonic(), message))
+            self._cond.notify_all()
+        if message.get("type") == "pair":
+            self.send({"type": "info", "sdkVersion": 6, "tpVersionString": "4.0.0.0.0", "tpVersionCode": 400000,
+                       "pluginVersion": 0, "settings": self.settings})
+
+    def send(self, message):
+        """ Send `message` to the plugin, returns the monotonic time it went out """
+        message.setdefault("pluginId", self.pluginId)
+        data = (json.dumps(message) + "\n").encode()
+        now = monotonic()
+        self._conn.sendall(data)
+        return now
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def wait_connected(self, timeout=10.0):
+        with self._cond:
+            return self._cond.wait_for(lambda: any(m.get("type") == "pair" for _, m in self.received), timeout)
+
+    def messages_since(self, start):
+        with self._cond:
+            return [(t, m) for t, m in self.received if t >= start]
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._server.close()
@@ -0,0 +1,118 @@
+import json
+import os
+import tracemalloc
+from time import perf_counter_ns
+
+
+class BenchResult(object):
+    """ Timings (ns) and allocations (bytes) of one benchmark case, per operation """
+    __slots__ = ("name", "p50", "p99", "mean", "peak", "retained", "calls")
+
+    def __init__(self, name, p50, p99, mean, peak, retained, calls):
+        self.name = name
+        self.p50 = p50
+        self.p99 = p99
+        self.mean = mean
+        self.peak = peak
+        self.retained = retained
+        self.calls = calls
+
+    def asdict(self):
+        return {field: getattr(self, field) for field in self.__slots__ if field != "name"}
+
+
+def percentile(samples, pct):
+    """ nearest-rank percentile of sorted `samples` """
+    if not samples:
+        return 0
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples) + 0.5) - 1))
+    return samples[index]
+
+
+def measure(name, fn, iterations=1000, warmup=50, alloc_iterations=200, call_counter=None):
+    """
+    Time `fn()` `iterations` times and trace its allocations for `alloc_iterations` more calls.
+
+    `peak` is the average transient memory one call needs, `retained` the average
+    memory still held after it returned (a steady non zero value means a leak).
+    `call_counter()` should return the total number of audio-layer calls so far,
+    `calls` is then the number of those one operation costs.
+    """
+    for _ in range(warmup):
+        fn()
+
+    calls_before = call_counter() if call_counter else 0
+    samples = []
+    for _ in range(iterations):
+        start = perf_counter_ns()
+        fn()
+        samples.append(perf_counter_ns() - start)
+    calls = (call_counter() - calls_before) / iterations if call_counter else 0
+    samples.sort()
+
+    peak = retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn()
+            current, high = tracemalloc.get_traced_memory()
+            peak += high - before
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+
+    return BenchResult(name, percentile(samples, 50), percentile(samples, 99), sum(samples) // len(samples),
+                       peak // max(1, alloc_iterations), retained // max(1, alloc_iterations), calls)
+
+
+def loadBaselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def saveBaselines(path, baselines):
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(result, baseline, tolerance=2.0, time_slack=2000, alloc_slack=512):
+    """
+    Regressions of `result` against its stored `baseline`, as readable strings.
+
+    Times may grow by `tolerance`x plus `time_slack` ns and allocations by
+    `tolerance`x plus `alloc_slack` bytes before they count, since both are
+    noisy. Audio-layer calls are deterministic and must not grow at all.
+    """
+    regressions = []
+    if not baseline:
+        return regressions
+    for field in ("p50", "p99"):
+        limit = baseline[field] * tolerance + time_slack
+        if getattr(result, field) > limit:
+            regressions.append(f"{result.name}: {field} {formatNs(getattr(result, field))} > {formatNs(limit)}")
+    for field in ("peak", "retained"):
+        limit = baseline[field] * tolerance + alloc_slack
+        if getattr(result, field) > limit:
+            regressions.append(f"{result.name}: {field} {getattr(result, field)} B > {int(limit)} B")
+    if result.calls > baseline.get("calls", 0) + 1e-9:
+        regressions.append(f"{result.name}: {result.calls:g} audio calls per op > {baseline['calls']:g}")
+    return regressions
+
+
+def formatNs(ns):
+    if ns >= 1_000_000:
+        return f"{ns / 1_000_000:.2f}ms"
+    if ns >= 1_000:
+        return f"{ns / 1_000:.1f}us"
+    return f"{int(ns)}ns"
+
+def formatTable(results):
+    lines = [f"{'case':<32} {'p50':>10} {'p99':>10} {'mean':>10} {'peak B':>9} {'kept B':>8} {'calls':>6}"]
+    for r in results:
+        lines.append(f"{r.name:<32} {formatNs(r.p50):>10} {formatNs(r.p99):>10} {formatNs(r.mean):>10} "
+                     f"{r.peak:>9} {r.retained:>8} {r.calls:>6g}")
+    return "\n".join(lines)
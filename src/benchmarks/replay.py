@@ -0,0 +1,196 @@
+"""
+End-to-end replay of Touch Portal message traces against the real plugin.
+
+Starts a FakeTouchPortal, points TPAudioMixer's TP client at it, runs the
+plugin on the simulated audio backend and replays a trace (recorded with
+`TPAudioMixer.py -r <file>`, or the synthetic default one):
+
+    python -m benchmarks.replay --speed 4
+    python -m benchmarks.replay --trace session.jsonl --speed 1
+
+Reports action-to-effect latency, outbound message rate and handler queue depth.
+"""
+import json
+import sys
+from argparse import ArgumentParser
+from bisect import bisect_left
+from collections import Counter
+from logging import WARNING
+from threading import Event, Thread
+from time import monotonic, sleep
+
+from audioUtil.backend import setBackend
+from audioUtil.simBackend import SimulatedAudioBackend
+from tppEntry import (PLUGIN_ID, TP_PLUGIN_ACTIONS, TP_PLUGIN_CONNECTORS,
+                      TP_PLUGIN_SETTINGS, TP_PLUGIN_STATES)
+from tpUtil.traceRecorder import loadTrace
+
+from .fakeTouchPortal import FakeTouchPortal
+from .harness import formatNs, percentile
+from .traces import defaultTrace
+
+
+def volumeStateId(app):
+    if app == "Master Volume":
+        return TP_PLUGIN_STATES["master volume"]["id"]
+    if app == "Current app":
+        return TP_PLUGIN_STATES["currentAppVolume"]["id"]
+    return PLUGIN_ID + f".createState.{app}.volume"
+
+def sliderKey(message):
+    return (message.get("connectorId"),) + tuple(item["value"] for item in message.get("data", ()))
+
+def expectFor(message, later=()):
+    """
+    Predicate (receive time, plugin message) that shows `message` took effect, None if it has no visible effect.
+    `later` are the (send time, value) of the changes that followed a connector change on the same slider, the
+    plugin only applies the latest value of a drag so any of them showing up counts as well.
+    """
+    kind = message.get("type")
+    if kind == "connectorChange" and message.get("connectorId") == TP_PLUGIN_CONNECTORS["APP control"]["id"]:
+        stateId, value = volumeStateId(message["data"][0]["value"]), str(message["value"])
+        def expect(t, m):
+            if m.get("type") != "stateUpdate" or m.get("id") != stateId:
+                return False
+            return m.get("value") == value or any(m.get("value") == v for sentAt, v in later if sentAt <= t)
+        return expect
+    if kind == "down" and message.get("actionId") == TP_PLUGIN_ACTIONS["Inc/DecrVol"]["id"]:
+        stateId = volumeStateId(message["data"][0]["value"])
+        return lambda t, m: m.get("type") == "stateUpdate" and m.get("id") == stateId
+    if kind == "listChange":
+        instanceId = message.get("instanceId")
+        return lambda t, m: m.get("type") == "choiceUpdate" and m.get("instanceId") == instanceId
+    return None
+
+
+def handlerQueueDepth(client):
+    """ Event handler calls waiting for a worker thread of the TP client """
+    queue = getattr(getattr(client, "_executor", None), "_work_queue", None)
+    return queue.qsize() if queue is not None else 0
+
+
+class QueueSampler(object):
+    def __init__(self, client, interval=0.005):
+        self.client = client
+        self.interval = interval
+        self.samples = []
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name="QueueSampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(handlerQueueDepth(self.client))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def replay(server, trace, speed=1.0):
+    """ Send `trace` to the plugin, `speed` times faster than recorded (0 = as fast as possible) """
+    sent = []
+    start = monotonic()
+    for t, message in trace:
+        if speed > 0 and (delay := start + t / speed - monotonic()) > 0:
+            sleep(delay)
+        sent.append((server.send(dict(message)), message))
+    return sent
+
+def matchEffects(sent, received):
+    """ {message type: [latency ns]} and the number of actions whose effect never showed up """
+    times = [t for t, _ in received]
+    sliders = {}  # slider -> [(send time, value)]
+    for sentAt, message in sent:
+        if message.get("type") == "connectorChange":
+            sliders.setdefault(sliderKey(message), []).append((sentAt, str(message["value"])))
+    latencies = {}
+    missing = 0
+    for sentAt, message in sent:
+        later = [(t, v) for t, v in sliders.get(sliderKey(message), ()) if t > sentAt] if message.get("type") == "connectorChange" else ()
+        if (expect := expectFor(message, later)) is None:
+            continue
+        for t, reply in received[bisect_left(times, sentAt):]:
+            if expect(t, reply):
+                latencies.setdefault(message["type"], []).append(int((t - sentAt) * 1e9))
+                break
+        else:
+            missing += 1
+    return latencies, missing
+
+
+def report(sent, received, duration, latencies, missing, queueSamples, connectorStats=None):
+    lines = [f"replayed {len(sent)} messages in {duration:.2f}s"]
+    allLatencies = sorted(latency for values in latencies.values() for latency in values)
+    for kind, values in sorted(latencies.items()) + [("all", allLatencies)]:
+        values = sorted(values)
+        if values:
+            lines.append(f"  action->effect {kind:<16} n={len(values):<5} p50={formatNs(percentile(values, 50)):>9} "
+                         f"p99={formatNs(percentile(values, 99)):>9} max={formatNs(values[-1]):>9}")
+    lines.append(f"  actions without a visible effect: {missing}")
+    if connectorStats:
+        # superseded slider values are dropped on purpose, they are part of `missing`
+        lines.append(f"  connector changes: applied={connectorStats['applied']} coalesced={connectorStats['coalesced']}")
+
+    kinds = Counter(m.get("type") for _, m in received)
+    lines.append(f"  outbound: {len(received)} messages, {len(received) / max(duration, 1e-9):.1f}/s "
+                 + ", ".join(f"{kind}={count}" for kind, count in kinds.most_common()))
+    if queueSamples:
+        lines.append(f"  handler queue depth: max={max(queueSamples)} mean={sum(queueSamples) / len(queueSamples):.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Replay Touch Portal traces against the plugin")
+    parser.add_argument("--trace", help="trace file recorded with TPAudioMixer.py -r (default: synthetic trace)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 for as fast as possible")
+    parser.add_argument("--sessions", type=int, default=10, help="number of simulated audio sessions")
+    parser.add_argument("--devices", type=int, default=4, help="number of simulated endpoints per flow")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every simulated audio call takes")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to let the plugin start up")
+    parser.add_argument("--drain", type=float, default=1.0, help="seconds to wait for effects after the last message")
+    parser.add_argument("--json", metavar="FILE", help="also write the raw results to FILE")
+    parser.add_argument("-v", action="store_true", help="keep the plugin's info logging")
+    opts = parser.parse_args(argv)
+
+    setBackend(SimulatedAudioBackend(sessions=opts.sessions, devices=opts.devices, latency=opts.latency))
+    server = FakeTouchPortal(PLUGIN_ID, settings=[{s["name"]: s["default"]} for s in TP_PLUGIN_SETTINGS.values()])
+
+    import TPAudioMixer as plugin
+    if not opts.v:
+        plugin.g_log.setLevel(WARNING)
+        plugin.TPClient.setLogLevel(WARNING)
+    plugin.TPClient.TPPORT = server.port
+    Thread(target=plugin.TPClient.connect, name="TPClient", daemon=True).start()
+    if not server.wait_connected():
+        print("plugin did not connect")
+        return 1
+    sleep(opts.settle)
+
+    trace = loadTrace(opts.trace) if opts.trace else defaultTrace()
+    start = monotonic()
+    with QueueSampler(plugin.TPClient) as sampler:
+        sent = replay(server, trace, opts.speed)
+        sleep(opts.drain)
+    duration = monotonic() - start
+    received = server.messages_since(start)
+
+    server.send({"type": "closePlugin"})
+    plugin.running = False
+    server.close()
+
+    latencies, missing = matchEffects(sent, received)
+    connectorStats = plugin.connectorCoalescer.stats()
+    print(report(sent, received, duration, latencies, missing, sampler.samples, connectorStats))
+    if opts.json:
+        with open(opts.json, "w") as f:
+            json.dump({"duration": duration, "sent": len(sent), "received": len(received), "missing": missing,
+                       "latencies": latencies, "queueDepth": sampler.samples, "connectors": connectorStats}, f)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
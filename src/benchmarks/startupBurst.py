@@ -0,0 +1,76 @@
+"""
+Messages the plugin sends to Touch Portal when it connects with N audio sessions.
+
+Each session count runs the real plugin in its own process against a
+FakeTouchPortal on the simulated backend:
+
+    python -m benchmarks.startupBurst --sessions 1 10 30 100
+    python -m benchmarks.startupBurst --no-coalesce     # state creation/choice lists sent one by one
+"""
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+from collections import Counter
+from contextlib import nullcontext
+from logging import WARNING
+from threading import Thread
+from time import monotonic, sleep
+
+from audioUtil.backend import setBackend
+from audioUtil.simBackend import SimulatedAudioBackend
+from tppEntry import PLUGIN_ID, TP_PLUGIN_SETTINGS
+
+from .fakeTouchPortal import FakeTouchPortal
+
+
+def measureStartup(sessions, settle=1.0, coalesce=True):
+    """ {message type: count} the plugin sent in its first `settle` seconds """
+    setBackend(SimulatedAudioBackend(sessions=sessions, devices=2))
+    server = FakeTouchPortal(PLUGIN_ID, settings=[{s["name"]: s["default"]} for s in TP_PLUGIN_SETTINGS.values()])
+
+    import TPAudioMixer as plugin
+    plugin.g_log.setLevel(WARNING)
+    plugin.TPClient.setLogLevel(WARNING)
+    if not coalesce:
+        plugin.stateMirror.window = 0
+        plugin.stateMirror.hold = nullcontext
+    plugin.TPClient.TPPORT = server.port
+    Thread(target=plugin.TPClient.connect, name="TPClient", daemon=True).start()
+    server.wait_connected()
+    start = monotonic()
+    sleep(settle)
+    counts = Counter(m.get("type") for _, m in server.messages_since(start))
+
+    server.send({"type": "closePlugin"})
+    plugin.running = False
+    server.close()
+    return dict(counts)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Plugin startup messages by session count")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 30, 100])
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds of startup traffic to count")
+    parser.add_argument("--no-coalesce", action="store_true", help="send state creation and choice lists one by one")
+    parser.add_argument("--child", type=int, help=None)
+    opts = parser.parse_args(argv)
+
+    if opts.child is not None:
+        print(json.dumps(measureStartup(opts.child, opts.settle, not opts.no_coalesce)))
+        return 0
+
+    kinds = ("createState", "choiceUpdate", "stateUpdate", "connectorUpdate")
+    print(f"{'sessions':>8} {'total':>7} " + " ".join(f"{kind:>15}" for kind in kinds))
+    for sessions in opts.sessions:
+        args = [sys.executable, "-m", "benchmarks.startupBurst", "--child", str(sessions), "--settle", str(opts.settle)]
+        if opts.no_coalesce:
+            args.append("--no-coalesce")
+        output = subprocess.run(args, capture_output=True, text=True, check=True).stdout
+        counts = json.loads(output.strip().splitlines()[-1])
+        print(f"{sessions:>8} {sum(counts.values()):>7} " + " ".join(f"{counts.get(kind, 0):>15}" for kind in kinds))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
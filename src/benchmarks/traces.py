@@ -0,0 +1,65 @@
+"""
+Synthetic Touch Portal message traces, in the same (seconds, message) form
+tpUtil.traceRecorder writes, for when there is no recorded session at hand.
+"""
+from tppEntry import (PLUGIN_ID, TP_PLUGIN_ACTIONS, TP_PLUGIN_CONNECTORS,
+                      TP_PLUGIN_INFO)
+
+APP_CONTROL = TP_PLUGIN_CONNECTORS["APP control"]
+VOLUME_ACTION = TP_PLUGIN_ACTIONS["Inc/DecrVol"]
+OUTPUT_ACTION = TP_PLUGIN_ACTIONS["ChangeOut/Input"]
+
+
+def appConnectorId(app):
+    return f"pc_{TP_PLUGIN_INFO['id']}_{APP_CONTROL['id']}|{APP_CONTROL['data']['appchoice']['id']}={app}"
+
+def shortIds(apps, t0=0.0):
+    """ What Touch Portal sends for APP control sliders that are on the current page """
+    return [(t0, {"type": "shortConnectorIdNotification", "pluginId": PLUGIN_ID,
+                  "connectorId": appConnectorId(app), "shortId": f"sc{i}"})
+            for i, app in enumerate(apps)]
+
+def connectorDrag(app, start, end, duration, rate=60, t0=0.0):
+    """ An APP control slider dragged from `start` to `end` over `duration` seconds, `rate` updates a second """
+    steps = max(1, int(duration * rate))
+    trace = []
+    last = None
+    for i in range(steps + 1):
+        value = round(start + (end - start) * i / steps)
+        if value == last:
+            continue
+        last = value
+        trace.append((t0 + duration * i / steps, {
+            "type": "connectorChange", "pluginId": PLUGIN_ID, "connectorId": APP_CONTROL["id"], "value": value,
+            "data": [{"id": APP_CONTROL["data"]["appchoice"]["id"], "value": app}]}))
+    return trace
+
+def heldButton(app, action="Increase", step=1, duration=1.0, t0=0.0):
+    """ An 'Adjust App Volume' button held down for `duration` seconds """
+    data = [{"id": VOLUME_ACTION["data"]["AppChoice"]["id"], "value": app},
+            {"id": VOLUME_ACTION["data"]["OptionList"]["id"], "value": action},
+            {"id": VOLUME_ACTION["data"]["Volume"]["id"], "value": str(step)}]
+    return [(t0, {"type": "down", "pluginId": PLUGIN_ID, "actionId": VOLUME_ACTION["id"], "data": data}),
+            (t0 + duration, {"type": "up", "pluginId": PLUGIN_ID, "actionId": VOLUME_ACTION["id"], "data": data})]
+
+def listChange(value="Output", instanceId="inst-1", t0=0.0):
+    """ The Output/Input list of 'Change Audio Output' changed in the button editor """
+    return [(t0, {"type": "listChange", "pluginId": PLUGIN_ID, "actionId": OUTPUT_ACTION["id"],
+                  "listId": OUTPUT_ACTION["data"]["optionSel"]["id"], "instanceId": instanceId, "value": value})]
+
+def broadcast(pageName="Main", t0=0.0):
+    return [(t0, {"type": "broadcast", "event": "pageChange", "pageName": pageName})]
+
+def defaultTrace(apps=("app0.exe", "app1.exe")):
+    """ A few seconds of typical use: slider drags, a held button, list changes and page changes """
+    trace = shortIds(list(apps) + ["Master Volume"])
+    trace += connectorDrag(apps[0], 0, 100, 2.0, t0=0.5)
+    trace += connectorDrag("Master Volume", 100, 20, 1.0, t0=1.0)
+    trace += connectorDrag(apps[-1], 80, 10, 1.5, t0=2.0)
+    trace += heldButton(apps[0], "Decrease", 1, 1.0, t0=3.0)
+    for i in range(5):
+        trace += listChange("Output" if i % 2 else "Input", f"inst-{i}", t0=4.2 + i * 0.1)
+    for i in range(3):
+        trace += broadcast(f"Page {i}", t0=0.25 + i * 1.5)
+    trace.sort(key=lambda record: record[0])
+    return trace
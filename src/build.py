@@ -102,7 +102,11 @@ ADDITIONAL_FILES = [
 Any additional arguments to be passed to Pyinstaller. Optional.
 """
 ADDITIONAL_PYINSTALLER_ARGS = [
-    "--log-level=WARN"
+    "--log-level=WARN",
+    # profiling mode (-p), stdlib modules PyInstaller could otherwise leave out
+    "--hidden-import=cProfile",
+    "--hidden-import=pstats",
+    "--hidden-import=tracemalloc"
 ]
 
 ADDITIONAL_TPPSDK_ARGS = []
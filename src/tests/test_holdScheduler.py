@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+
+from tpUtil.holdScheduler import HoldScheduler
+
+
+class HoldSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = HoldScheduler(interval=0.01)
+        self.addCleanup(self.scheduler.release_all)
+
+    def counter(self):
+        steps = []
+        return steps, lambda multiplier: steps.append(multiplier)
+
+    def test_repeats_until_released(self):
+        steps, step = self.counter()
+        self.scheduler.hold("a", step)
+        time.sleep(0.1)
+        self.scheduler.release("a")
+        count = len(steps)
+        time.sleep(0.05)
+        self.assertGreater(count, 3)
+        self.assertEqual(len(steps), count)
+
+    def test_release_before_hold(self):
+        steps, step = self.counter()
+        # onHold_up handled before its onHold_down
+        self.scheduler.release("a")
+        self.scheduler.hold("a", step)
+        time.sleep(0.05)
+        self.assertFalse(self.scheduler.is_held("a"))
+        self.assertEqual(steps, [])
+
+    def test_failing_step_leaves_newer_hold(self):
+        failed = threading.Event()
+        def fail(multiplier):
+            failed.set()
+            raise RuntimeError("gone")
+        self.scheduler.hold("a", fail)
+        self.assertTrue(failed.wait(1.0))
+        self.scheduler.release("a")
+
+        steps, step = self.counter()
+        self.scheduler.hold("a", step)
+        time.sleep(0.05)
+        self.assertTrue(self.scheduler.is_held("a"))
+        self.assertGreater(len(steps), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+from audioUtil import processCache as processCacheModule
+from audioUtil.processCache import ProcessCache
+
+
+class FakeProcess(object):
+    """ psutil.Process of whatever `processes` says owns the pid right now """
+    processes = {}  # pid -> (create time, name)
+
+    def __init__(self, pid):
+        if pid not in self.processes:
+            raise processCacheModule.psutil.NoSuchProcess(pid)
+        self._create_time, self._name = self.processes[pid]
+
+    @contextmanager
+    def oneshot(self):
+        yield
+
+    def create_time(self):
+        return self._create_time
+
+    def name(self):
+        return self._name
+
+    def exe(self):
+        return "C:\\" + self._name
+
+    def ppid(self):
+        return 1
+
+
+class ProcessCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        FakeProcess.processes = {}
+        patcher = mock.patch.object(processCacheModule.psutil, "Process", FakeProcess)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # unpinned entries, like a process that can't be opened on Windows
+        patcher = mock.patch.object(processCacheModule, "pinProcess", lambda pid: None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = ProcessCache()
+
+    def test_hit(self):
+        FakeProcess.processes[42] = (100.0, "a.exe")
+        self.assertEqual(self.cache.name(42), "a.exe")
+        self.assertEqual(self.cache.name(42), "a.exe")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_reused_pid(self):
+        FakeProcess.processes[42] = (100.0, "a.exe")
+        self.assertEqual(self.cache.name(42), "a.exe")
+        # a.exe exits and its pid goes to another process right away
+        FakeProcess.processes[42] = (101.0, "b.exe")
+        self.assertEqual(self.cache.name(42), "b.exe")
+        self.assertEqual(self.cache.exe(42), "C:\\b.exe")
+
+    def test_exited(self):
+        FakeProcess.processes[42] = (100.0, "a.exe")
+        self.assertEqual(self.cache.name(42), "a.exe")
+        del FakeProcess.processes[42]
+        self.assertEqual(self.cache.name(42), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import cProfile
+import os
+import tempfile
+import threading
+import unittest
+
+from tpUtil.profiler import ProfilingSession
+
+
+def busy():
+    return sum(i * i for i in range(10000))
+
+
+class ProfilingSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.session = ProfilingSession(self.directory.name, interval=3600)
+
+    def tearDown(self):
+        self.session.stop()
+        self.directory.cleanup()
+
+    def files(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def test_idle_thread_is_left_out(self):
+        self.session.start()
+        # a thread that has not run any profiled code, its stats are empty
+        self.session._profiles.append(cProfile.Profile())
+        worker = threading.Thread(target=busy)
+        worker.start()
+        worker.join()
+
+        self.assertEqual(self.session.dump(), 1)
+        self.assertEqual(self.files(), ["memory-1.txt", "profile-1.prof", "profile-1.txt"])
+        with open(os.path.join(self.directory.name, "profile-1.txt")) as f:
+            self.assertIn("busy", f.read())
+
+    def test_no_profiled_code_still_writes_memory(self):
+        self.session.start()
+        with self.session._lock:
+            profiles, self.session._profiles = self.session._profiles, [cProfile.Profile()]
+        for profile in profiles:
+            profile.disable()
+
+        self.assertEqual(self.session.dump(), 1)
+        self.assertEqual(self.files(), ["memory-1.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
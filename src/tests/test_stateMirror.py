@@ -0,0 +1,57 @@
+import threading
+import unittest
+
+from tpUtil.stateMirror import StateMirror
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.sent = []  # (state id or shortId, value)
+
+    def stateUpdateMany(self, states):
+        self.sent += [(state["id"], state["value"]) for state in states]
+
+    def shortIdUpdate(self, shortId, value):
+        self.sent.append((shortId, value))
+
+
+class StateMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.mirror = StateMirror(self.client)
+
+    def last(self, key):
+        return [value for sent, value in self.client.sent if sent == key][-1]
+
+    def test_unchanged_value_is_dropped(self):
+        self.mirror.stateUpdate("a", 1)
+        self.mirror.stateUpdate("a", "1")
+        self.assertEqual(self.client.sent, [("a", "1")])
+        self.assertEqual(self.mirror.stats(), {"sent": 1, "suppressed": 1})
+
+    def test_batch_sent_after_a_newer_update(self):
+        updated, release = threading.Event(), threading.Event()
+        def older():
+            with self.mirror.batch():
+                self.mirror.stateUpdate("a", "older")
+                self.mirror.shortIdUpdate("s", 1)
+                updated.set()
+                release.wait()
+        thread = threading.Thread(target=older)
+        thread.start()
+        updated.wait()
+        self.mirror.stateUpdate("a", "newer")
+        self.mirror.shortIdUpdate("s", 2)
+        release.set()
+        thread.join()
+
+        # the older batch goes out last, Touch Portal still ends up with what the mirror holds
+        self.assertEqual(self.last("a"), "newer")
+        self.assertEqual(self.last("s"), 2)
+        self.mirror.stateUpdate("a", "newer")
+        self.assertEqual(self.last("a"), "newer")
+
+
+if __name__ == "__main__":
+    unittest.main()
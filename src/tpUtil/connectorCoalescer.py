@@ -0,0 +1,51 @@
+from logging import getLogger
+from threading import Lock
+
+log = getLogger(__name__)
+
+
+class ConnectorCoalescer(object):
+    """
+    Latest-value-wins application of connector (slider) changes.
+
+    `submit(key, value, apply)` runs `apply(value)` right away unless a value
+    for the same key is already being applied. In that case it only becomes the
+    pending value of the key, replacing (and counting as coalesced) any older
+    pending one, and the thread that is busy with the key applies it when it is
+    done. A slider drag therefore has at most one write in flight and one
+    waiting, however fast its events arrive; superseded values never reach
+    `apply`.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pending = {}  # key -> (value, apply)
+        self._busy = set()
+        self.applied = 0
+        self.coalesced = 0
+
+    def submit(self, key, value, apply):
+        """ True if this call applied the value(s) itself, False if it was handed to the busy thread """
+        with self._lock:
+            if key in self._busy:
+                if key in self._pending:
+                    self.coalesced += 1
+                self._pending[key] = (value, apply)
+                return False
+            self._busy.add(key)
+
+        while True:
+            try:
+                apply(value)
+            except Exception as e:
+                log.warning(f"connector change {key} failed: {e}")
+            with self._lock:
+                self.applied += 1
+                if (item := self._pending.pop(key, None)) is None:
+                    self._busy.discard(key)
+                    return True
+                value, apply = item
+
+    def stats(self):
+        with self._lock:
+            return {"applied": self.applied, "coalesced": self.coalesced}
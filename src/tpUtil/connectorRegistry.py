@@ -0,0 +1,71 @@
+from threading import Lock
+
+
+class ConnectorHandle(object):
+    """ Pre-resolved slider of one app, `update` goes straight to the state mirror """
+    __slots__ = ("registry", "app", "connectorId")
+
+    def __init__(self, registry, app, connectorId):
+        self.registry = registry
+        self.app = app
+        self.connectorId = connectorId
+
+    @property
+    def shortId(self):
+        return self.registry.shortId(self.app)
+
+    def update(self, value):
+        if (shortId := self.registry.shortId(self.app)) is not None:
+            self.registry.mirror.shortIdUpdate(shortId, value)
+
+    def forget(self):
+        """ The slider may not show what was sent last (the user dragged it), send the next value even if it is the same """
+        if (shortId := self.registry.shortId(self.app)) is not None:
+            self.registry.mirror.forget(shortIds=[shortId])
+
+
+class ConnectorRegistry(object):
+    """
+    Connector ids of one choice-based connector, built once per app, and an
+    app -> shortId index kept current from shortConnectorIdNotification messages.
+
+    `prefix` is everything before the app name, for example
+    "pc_<plugin id>_<connector id>|<choice data id>=".
+    """
+
+    def __init__(self, client, mirror, prefix):
+        self.client = client
+        self.mirror = mirror
+        self.prefix = prefix
+        self._lock = Lock()
+        self._handles = {}   # app -> ConnectorHandle
+        self._shortIds = {}  # app -> shortId
+
+    def connectorId(self, app):
+        return self.handle(app).connectorId
+
+    def handle(self, app):
+        if (handle := self._handles.get(app)) is None:
+            with self._lock:
+                handle = self._handles.setdefault(app, ConnectorHandle(self, app, self.prefix + app))
+        return handle
+
+    def shortId(self, app):
+        if (shortId := self._shortIds.get(app)) is None:
+            # the notification handler may not have run yet, the client tracks it as soon as it arrives
+            if (shortId := self.client.shortIdTracker.get(self.handle(app).connectorId)) is not None:
+                self._shortIds[app] = shortId
+        return shortId
+
+    def onShortIdNotification(self, connectorId, shortId):
+        """ Feed this with every shortConnectorIdNotification """
+        if connectorId.startswith(self.prefix):
+            self._shortIds[connectorId[len(self.prefix):]] = shortId
+
+    def resync(self):
+        """ Rebuild the index from the client's shortIdTracker """
+        shortIds = {connectorId[len(self.prefix):]: shortId
+                    for connectorId, shortId in list(self.client.shortIdTracker.items())
+                    if connectorId.startswith(self.prefix)}
+        with self._lock:
+            self._shortIds = shortIds
@@ -0,0 +1,112 @@
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic
+
+log = getLogger(__name__)
+
+# multiplier for the step value, by seconds the button has been held
+ACCELERATION_CURVES = {
+    "none": lambda held: 1.0,
+    "linear": lambda held: min(1.0 + held, 10.0),
+    "exponential": lambda held: min(2.0 ** held, 10.0),
+}
+
+EARLY_RELEASE_WINDOW = 1.0  # seconds a release that came before its hold cancels that hold
+
+
+class _HeldAction(object):
+    __slots__ = ("callback", "still_held", "started", "next_due", "stopped")
+
+    def __init__(self, callback, still_held, now):
+        self.callback = callback
+        self.still_held = still_held
+        self.started = now
+        self.next_due = now
+        self.stopped = False
+
+
+class HoldScheduler(object):
+    """
+    Repeats held actions from a single timer thread.
+
+    `hold(key, callback)` calls `callback(multiplier)` right away and then every
+    `interval` seconds until `release(key)` (or until `still_held()` says
+    otherwise). The multiplier comes from the acceleration curve. Steps are
+    scheduled from the previous due time, so a slow step doesn't shift the
+    ones after it; steps that are missed entirely are skipped, not bunched up.
+
+    Holds and releases may come from different threads, so a release can be
+    handled before its hold: it is remembered for EARLY_RELEASE_WINDOW seconds
+    and the hold that follows doesn't start. A hold that stops by itself (a
+    failing step, `still_held()`) stays registered until its release, so that
+    release isn't taken for an early one.
+    """
+
+    def __init__(self, interval=0.05, curve="none"):
+        self.interval = interval
+        self.curve = curve
+        self._cond = Condition()
+        self._held = {}      # key -> _HeldAction
+        self._released = {}  # key -> when a release without a hold came in
+        self._thread = None
+
+    def hold(self, key, callback, still_held=None):
+        with self._cond:
+            now = monotonic()
+            if (released := self._released.pop(key, None)) is not None and now - released < EARLY_RELEASE_WINDOW:
+                return
+            self._held[key] = _HeldAction(callback, still_held, now)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="HoldScheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def release(self, key):
+        with self._cond:
+            if self._held.pop(key, None) is None:
+                now = monotonic()
+                self._released = {released: when for released, when in self._released.items()
+                                  if now - when < EARLY_RELEASE_WINDOW}
+                self._released[key] = now
+            self._cond.notify()
+
+    def release_all(self):
+        with self._cond:
+            self._held.clear()
+            self._released.clear()
+            self._cond.notify()
+
+    def is_held(self, key):
+        with self._cond:
+            return (held := self._held.get(key)) is not None and not held.stopped
+
+    def _stop(self, held):
+        # only this hold, a newer one under the same key keeps going
+        with self._cond:
+            held.stopped = True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = monotonic()
+                due = [(key, held) for key, held in self._held.items() if not held.stopped and held.next_due <= now]
+                if not due:
+                    wait = min((held.next_due for held in self._held.values() if not held.stopped), default=now + 1.0) - now
+                    self._cond.wait(wait)
+                    continue
+                multiplier = ACCELERATION_CURVES.get(self.curve, ACCELERATION_CURVES["none"])
+
+            for key, held in due:
+                if held.still_held is not None and not held.still_held():
+                    self._stop(held)
+                    continue
+                try:
+                    held.callback(multiplier(now - held.started))
+                except Exception as e:
+                    log.warning(f"held action {key} failed, stopping it: {e}")
+                    self._stop(held)
+                    continue
+
+                held.next_due += self.interval
+                if held.next_due < monotonic():
+                    held.next_due = monotonic() + self.interval
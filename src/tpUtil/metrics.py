@@ -0,0 +1,132 @@
+from functools import wraps
+from threading import Lock
+from time import monotonic, perf_counter_ns
+
+BUCKET_SHIFT = 10   # first bucket holds everything up to ~1us
+BUCKETS = 28        # last one everything above ~2 minutes
+
+
+def formatNs(ns):
+    if ns >= 1_000_000_000:
+        return f"{ns / 1_000_000_000:.2f}s"
+    if ns >= 1_000_000:
+        return f"{ns / 1_000_000:.2f}ms"
+    if ns >= 1_000:
+        return f"{ns / 1_000:.1f}us"
+    return f"{int(ns)}ns"
+
+
+class Histogram(object):
+    """ Latencies in power-of-two nanosecond buckets, percentiles are a bucket's upper bound """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[min(max(0, ns.bit_length() - BUCKET_SHIFT), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(1 << (i + BUCKET_SHIFT), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return "n=0"
+        return (f"n={self.count} p50={formatNs(self.percentile(50))} p99={formatNs(self.percentile(99))} "
+                f"max={formatNs(self.max)}")
+
+
+class Metrics(object):
+    """
+    Named latency histograms and counters.
+
+    `timed(name)` wraps a function and records how long every call took,
+    `name` can also be a function of the call's arguments (one histogram per
+    action id, for example). `watch(name, total)` adds a counter that is read
+    from `total()` instead of being counted here. `rates()` is the per second
+    increase of every counter since the previous `rates()` call.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._histograms = {}  # name -> Histogram
+        self._counters = {}    # name -> int
+        self._sources = {}     # name -> callable returning a running total
+        self._sourceBase = {}  # name -> its total at the last reset
+        self._rateBase = ({}, monotonic())
+        self._started = monotonic()
+
+    def record(self, name, ns):
+        with self._lock:
+            if (histogram := self._histograms.get(name)) is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(ns)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def watch(self, name, total):
+        self._sources[name] = total
+
+    def timed(self, name):
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name(*args, **kwargs) if callable(name) else name, perf_counter_ns() - start)
+            return wrapper
+        return decorator
+
+    def counters(self):
+        with self._lock:
+            counters = dict(self._counters)
+        for name, total in self._sources.items():
+            counters[name] = total() - self._sourceBase.get(name, 0)
+        return counters
+
+    def histograms(self):
+        """ {name: summary} """
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in self._histograms.items()}
+
+    def rates(self):
+        counters, now = self.counters(), monotonic()
+        base, since = self._rateBase
+        self._rateBase = (counters, now)
+        elapsed = max(now - since, 1e-9)
+        return {name: (value - base.get(name, 0)) / elapsed for name, value in counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+        self._sourceBase = {name: total() for name, total in self._sources.items()}
+        self._rateBase = (self.counters(), monotonic())
+        self._started = monotonic()
+
+    def format(self):
+        """ Every histogram and counter, one per line, for the log """
+        elapsed = max(monotonic() - self._started, 1e-9)
+        lines = [f"plugin metrics over the last {elapsed:.0f}s:"]
+        lines += [f"  {name}: {summary}" for name, summary in sorted(self.histograms().items())]
+        lines += [f"  {name}: {value} ({value / elapsed:.1f}/s)" for name, value in sorted(self.counters().items())]
+        return "\n".join(lines)
@@ -0,0 +1,155 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from logging import getLogger
+from time import strftime
+
+log = getLogger(__name__)
+
+# allocations made by the profiling machinery itself
+IGNORED_ALLOCATIONS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class _ProfileSnapshot(object):
+    """ What pstats.Stats loads from, without stopping a profiler that is still running """
+
+    def __init__(self, profile):
+        profile.snapshot_stats()
+        self.stats = profile.stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfilingSession(object):
+    """
+    cProfile on every thread plus tracemalloc, dumped to `directory` every
+    `interval` seconds.
+
+    cProfile only sees the thread it was enabled on, so `start` enables one
+    for the calling thread and installs a threading profile hook that enables
+    one more in each thread started afterwards (the TP client's handler
+    workers, stateUpdate, timers). Threads that were already running are not
+    profiled, so start it before connecting.
+
+    Every dump writes profile-<n>.prof (all threads merged, for pstats or
+    snakeviz), profile-<n>.txt (top functions by cumulative and own time) and
+    memory-<n>.txt (top allocations by line and the change since the previous
+    dump). Threads that have not run any profiled code yet are left out, and
+    there are no profile files at all while none has. Profiles are cumulative
+    since `start`.
+    """
+
+    def __init__(self, directory, interval=60.0, top=30, frames=10):
+        self.directory = directory
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._profiles = []  # one cProfile.Profile per profiled thread
+        self._snapshot = None
+        self._dumps = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _enableForThread(self, *args):
+        # runs as the first profile event of a new thread, the profile that is enabled here replaces this hook
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles through sys.monitoring, the first profile already sees every thread
+            sys.setprofile(None)
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tracemalloc.start(self.frames)
+        # started before the hook, the dumps themselves don't show up in the profile
+        self._thread = threading.Thread(target=self._run, name="ProfilingSession", daemon=True)
+        self._thread.start()
+        threading.setprofile(self._enableForThread)
+        self._enableForThread()
+        log.info(f"Profiling to {os.path.abspath(self.directory)} every {self.interval:g}s")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.dump()
+            except Exception as e:
+                log.warning(f"Could not write profile dump: {e}")
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def dump(self):
+        """ Write the next set of profile and memory files, returns their number """
+        with self._lock:
+            self._dumps += 1
+            n = self._dumps
+            profiles = list(self._profiles)
+        stamp = strftime("%Y-%m-%d %H:%M:%S")
+
+        # one part failing doesn't cost the other one its files
+        try:
+            self._dumpProfiles(n, stamp, profiles)
+        except Exception as e:
+            log.warning(f"Could not write profile-{n}: {e}")
+        try:
+            self._dumpMemory(n, stamp)
+        except Exception as e:
+            log.warning(f"Could not write memory-{n}.txt: {e}")
+        return n
+
+    def _dumpProfiles(self, n, stamp, profiles):
+        # pstats refuses empty stats, a thread that never ran profiled code has none
+        if not (snapshots := [snapshot for snapshot in map(_ProfileSnapshot, profiles) if snapshot.stats]):
+            return
+        stats = pstats.Stats(*snapshots, stream=io.StringIO())
+        stats.dump_stats(self._path(f"profile-{n}.prof"))
+        with open(self._path(f"profile-{n}.txt"), "w") as f:
+            f.write(f"{stamp}, {len(snapshots)} thread(s)\n")
+            stats.stream = f
+            stats.sort_stats("cumulative").print_stats(self.top)
+            stats.sort_stats("tottime").print_stats(self.top)
+
+    def _dumpMemory(self, n, stamp):
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_ALLOCATIONS)
+        current, peak = tracemalloc.get_traced_memory()
+        with open(self._path(f"memory-{n}.txt"), "w") as f:
+            f.write(f"{stamp}, traced {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n")
+            f.write(f"\nTop {self.top} allocations by line:\n")
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                f.write(f"{stat}\n")
+            if self._snapshot is not None:
+                f.write(f"\nTop {self.top} changes since memory-{n - 1}.txt:\n")
+                for stat in snapshot.compare_to(self._snapshot, "lineno")[:self.top]:
+                    f.write(f"{stat}\n")
+        self._snapshot = snapshot
+
+    def stop(self):
+        """ Stop profiling and write a last dump, a failing dump is logged and doesn't get in the way of shutting down """
+        self._stop.set()
+        threading.setprofile(None)
+        try:
+            self.dump()
+        except Exception as e:
+            log.warning(f"Could not write the last profile dump: {e}")
+        finally:
+            with self._lock:
+                for profile in self._profiles:
+                    profile.disable()
+            tracemalloc.stop()
@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+from threading import Lock, Timer, local
+
+
+class StateMirror(object):
+    """
+    Plugin-side copy of every state and connector value last sent to Touch Portal.
+
+    Values that did not change are dropped before they reach the socket. Inside
+    `with mirror.batch():` changed values are collected and sent together when
+    the block exits, so one stateUpdate tick turns into a single write.
+
+    Dynamic state creation and choice lists are coalesced: `createStates` and
+    `choiceUpdate` are held for `window` seconds (or until the outermost
+    `with mirror.hold():` exits) and then go out as one createStateMany and one
+    choiceUpdate per list. Values set on a state that is still waiting to be
+    created become its initial value.
+    """
+
+    def __init__(self, client, window=0.0):
+        self._client = client
+        self._lock = Lock()
+        self._states = {}      # stateId -> last sent value
+        self._connectors = {}  # shortId -> last sent value
+        self._choices = {}     # choiceId -> last sent list
+        self._creates = {}     # stateId -> state waiting to be created
+        self._pendingChoices = {}  # choiceId -> list waiting to be sent
+        self._holds = 0
+        self._timer = None
+        self._local = local()
+        self.window = window
+        self.sent = 0
+        self.suppressed = 0
+
+    def _pending(self):
+        return getattr(self._local, "pending", None)
+
+    @contextmanager
+    def batch(self):
+        outer = self._pending()
+        if outer is None:
+            self._local.pending = ({}, {})
+        try:
+            yield self
+        finally:
+            if outer is None:
+                states, connectors = self._local.pending
+                self._local.pending = None
+                self._send(states, connectors)
+
+    def _changed(self, cache, key, value):
+        with self._lock:
+            if cache.get(key) == value:
+                self.suppressed += 1
+                return False
+            cache[key] = value
+            return True
+
+    def stateUpdate(self, stateId, value):
+        value = str(value)
+        with self._lock:
+            if (pending := self._creates.get(stateId)) is not None:
+                pending["value"] = self._states[stateId] = value
+                return
+        if not self._changed(self._states, stateId, value):
+            return
+        if (pending := self._pending()) is not None:
+            pending[0][stateId] = value
+        else:
+            self._send({stateId: value}, {})
+
+    def shortIdUpdate(self, shortId, value):
+        value = int(value)
+        if not self._changed(self._connectors, shortId, value):
+            return
+        if (pending := self._pending()) is not None:
+            pending[1][shortId] = value
+        else:
+            self._send({}, {shortId: value})
+
+    def _send(self, states, connectors):
+        # under the lock and with the latest cached values: when two threads update the same state, the
+        # one that sends last may not be the one that updated last, but what it sends is what the mirror holds
+        with self._lock:
+            if states:
+                self._client.stateUpdateMany([{"id": stateId, "value": self._states.get(stateId, value)}
+                                              for stateId, value in states.items()])
+            for shortId, value in connectors.items():
+                self._client.shortIdUpdate(shortId, self._connectors.get(shortId, value))
+            self.sent += len(states) + len(connectors)
+
+    @contextmanager
+    def hold(self):
+        """ Keep state creation and choice lists back until the outermost hold exits """
+        with self._lock:
+            self._holds += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._holds -= 1
+                release = not self._holds
+            if release:
+                self.flush()
+
+    def _schedule(self):
+        """ called with the lock held """
+        if self._holds or self._timer is not None:
+            return False
+        if self.window <= 0:
+            return True
+        self._timer = Timer(self.window, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+        return False
+
+    def createStates(self, states):
+        """ createStateMany, coalesced with other creates in the same window """
+        with self._lock:
+            for state in states:
+                state = dict(state)
+                state["value"] = str(state.get("value", ""))
+                self._creates[state["id"]] = state
+                self._states[state["id"]] = state["value"]
+            now = self._schedule()
+        if now:
+            self.flush()
+
+    def removeStates(self, stateIds):
+        """ removeStateMany, states that were never created are just dropped """
+        with self._lock:
+            remove = [stateId for stateId in stateIds if self._creates.pop(stateId, None) is None]
+            for stateId in stateIds:
+                self._states.pop(stateId, None)
+        if remove:
+            self._client.removeStateMany(remove)
+
+    def choiceUpdate(self, choiceId, values):
+        """ choiceUpdate, only the last list per choice in a window is sent and only if it changed """
+        values = list(values)
+        with self._lock:
+            if choiceId not in self._pendingChoices and self._choices.get(choiceId) == values:
+                self.suppressed += 1
+                return
+            self._pendingChoices[choiceId] = values
+            now = self._schedule()
+        if now:
+            self.flush()
+
+    def flush(self):
+        """ Send whatever creates and choice lists are waiting """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            creates, self._creates = self._creates, {}
+            choices, self._pendingChoices = self._pendingChoices, {}
+            # still under the lock, so no value update for these states can overtake their creation
+            if creates:
+                self._client.createStateMany(list(creates.values()))
+            for choiceId, values in choices.items():
+                if self._choices.get(choiceId) != values:
+                    self._choices[choiceId] = values
+                    self._client.choiceUpdate(choiceId, values)
+                    self.sent += 1
+            self.sent += len(creates)
+
+    def forget(self, stateIds=(), shortIds=()):
+        """ Drop cached values, e.g. when a state was removed and may be created again """
+        with self._lock:
+            for stateId in stateIds:
+                self._states.pop(stateId, None)
+            for shortId in shortIds:
+                self._connectors.pop(shortId, None)
+
+    def stats(self):
+        with self._lock:
+            return {"sent": self.sent, "suppressed": self.suppressed}
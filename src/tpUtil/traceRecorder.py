@@ -0,0 +1,55 @@
+import json
+from threading import Lock
+from time import monotonic
+
+
+def loadTrace(path):
+    """ [(seconds from start, message)] of a trace file written by TraceRecorder """
+    trace = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                trace.append((record["t"], record["msg"]))
+    return trace
+
+def saveTrace(path, trace):
+    with open(path, "w") as f:
+        for t, message in trace:
+            f.write(json.dumps({"t": round(t, 6), "msg": message}) + "\n")
+
+
+class TraceRecorder(object):
+    """
+    Writes every message Touch Portal sends to a JSON lines file, one
+    {"t": seconds since the first message, "msg": message} per line,
+    so a session can be replayed later. Hook `record` to TYPES.allMessage
+    and `close` it (or use it as a context manager) when the client is done.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "w")
+        self._lock = Lock()
+        self._start = None
+
+    def record(self, data):
+        with self._lock:
+            if self._file is None:
+                return
+            now = monotonic()
+            if self._start is None:
+                self._start = now
+            self._file.write(json.dumps({"t": round(now - self._start, 6), "msg": data}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -26,7 +26,52 @@ TP_PLUGIN_SETTINGS = {
         'default': "Enter '.exe' name seperated by a comma for more then 1",
         'readOnly': False,
         'value': None,
-        "doc": "A list of processes to ignore when searching for audio processes. This is useful if you have a process that is not an audio process, but is still playing audio. You can add the name of the process to this list and Touch Portal will ignore it when searching for audio processes."
+        "doc": "A list of processes to ignore when searching for audio processes. This is useful if you have a process that is not an audio process, but is still playing audio. You can add the name of the process to this list and Touch Portal will ignore it when searching for audio processes. Names are matched exactly (ignoring case), entries can also be wildcards like 'steam*.exe' or regular expressions starting with 're:'. Changes apply to apps that are already running."
+    },
+    'device resync': {
+        'name': "Default device resync interval (seconds)",
+        'type': "number",
+        'default': "30",
+        'minValue': 1,
+        'readOnly': False,
+        'value': None,
+        "doc": "Default device states are updated as soon as Windows reports a change. This is how often they are also checked manually as a fallback."
+    },
+    'hold rate': {
+        'name': "Hold repeat rate (ms)",
+        'type': "number",
+        'default': "50",
+        'minValue': 10,
+        'readOnly': False,
+        'value': None,
+        "doc": "How often a held 'Adjust App Volume' button repeats."
+    },
+    'hold acceleration': {
+        'name': "Hold acceleration",
+        'type': "text",
+        'default': "None",
+        'readOnly': False,
+        'value': None,
+        "doc": "How a held 'Adjust App Volume' button speeds up the longer it is held. One of None, Linear or Exponential."
+    },
+    'metrics interval': {
+        'name': "Metrics states interval (seconds)",
+        'type': "number",
+        'default': "0",
+        'minValue': 0,
+        'readOnly': False,
+        'value': None,
+        "doc": "How often the plugin's own latency and message rate metrics are published as states (under 'Plugin metrics'). 0 turns the states off, the 'Plugin Metrics' action can still write them to the log."
+    },
+    'peak meter rate': {
+        'name': "Peak meter rate (per second)",
+        'type': "number",
+        'default': "0",
+        'minValue': 0,
+        'maxValue': 30,
+        'readOnly': False,
+        'value': None,
+        "doc": "How often the peak meters of apps and default devices are sampled, 10 to 30 makes for smooth meters. 0 turns them off."
     },
 }
 
@@ -54,6 +99,21 @@ TP_PLUGIN_CONNECTORS = {
             }
         }
     },
+    "APP peak": {
+        "id": PLUGIN_ID + ".connector.APPpeak",
+        "name": "Volume Mixer: APP peak meter",
+        "format": "Show peak meter of $[1]",
+        "label": "app peak meter",
+        "data": {
+            "appchoice": {
+                "id": PLUGIN_ID + ".connector.APPpeak.data.appchoice",
+                "type": "choice",
+                "label": "APP choice list for APP peak meter",
+                "default": "",
+                "valueChoices": []
+            }
+        }
+    },
     ## Disabled because it was too much for plugin to handle
     # "Windows Audio": {
     #     "id": PLUGIN_ID + ".connector.WinAudio",
@@ -259,6 +319,44 @@ TP_PLUGIN_ACTIONS = {
             },
         }
     },
+    'CycleOut/Input': {
+        'category': "main",
+        'id': PLUGIN_ID + ".act.CycleAudioDevice",
+        'name': 'Audio Output/Input Device Cycle',
+        'prefix': TP_PLUGIN_CATEGORIES['main']['name'],
+        'type': "communicate",
+        'tryInline': True,
+        'format': "Cycle audio device$[1]through$[2]$[3]",
+        "doc": "Make the next device of a list the default, wrapping around at the end. Device names are separated by a comma, leave it empty to cycle through every active device.",
+        'data': {
+            'optionSel': {
+                'id': PLUGIN_ID + ".act.CycleAudioDevice.choice",
+                'type': "choice",
+                'label': "device type",
+                'default': "Pick One",
+                "valueChoices": [
+                    "Output",
+                    "Input"
+                ]
+            },
+            'deviceList': {
+                'id': PLUGIN_ID + ".act.CycleAudioDevice.data.devices",
+                'type': "text",
+                'label': "Device names",
+                'default': ""
+            },
+            'setType': {
+                'id': PLUGIN_ID + ".act.CycleAudioDevice.setType",
+                'type': "choice",
+                'label': "Set audio device type",
+                'default': "Default",
+                "valueChoices": [
+                    "Default",
+                    "Communications"
+                ]
+            },
+        }
+    },
     'setDeviceVolume': {
         # 'category' is optional, if omitted then this action will be added to all, or the only, category(ies)
         'category': "main",
@@ -335,6 +433,171 @@ TP_PLUGIN_ACTIONS = {
                 ]
             }
         }
+    },
+    'metrics': {
+        'category': "main",
+        'id': PLUGIN_ID + ".act.metrics",
+        'name': 'Plugin Metrics',
+        'prefix': TP_PLUGIN_CATEGORIES['main']['name'],
+        'type': "communicate",
+        'tryInline': True,
+        'format': "$[1]plugin metrics",
+        "doc": "Write the plugin's handler latencies, audio call timings and message rates to the log, or start them over.",
+        'data': {
+            'OptionList': {
+                'id': PLUGIN_ID + ".act.metrics.data.choice",
+                'type': "choice",
+                'label': "Option choice",
+                'default': "Log",
+                "valueChoices": [
+                    "Log",
+                    "Reset"
+                ]
+            },
+        }
+    },
+    'mixerScene': {
+        'category': "main",
+        'id': PLUGIN_ID + ".act.mixerScene",
+        'name': 'Mixer Scene',
+        'prefix': TP_PLUGIN_CATEGORIES['main']['name'],
+        'type': "communicate",
+        'tryInline': True,
+        'format': "$[1]mixer scene$[2]crossfading over$[3]ms$[4]",
+        "doc": "Save the volume, mute and audio device of every app and the volume and mute of every device under a name, restore them all at once (optionally crossfading) or delete the scene.",
+        'data': {
+            'OptionList': {
+                'id': PLUGIN_ID + ".act.mixerScene.data.choice",
+                'type': "choice",
+                'label': "Option choice",
+                'default': "Restore",
+                "valueChoices": [
+                    "Restore",
+                    "Save",
+                    "Delete"
+                ]
+            },
+            'Scene': {
+                'id': PLUGIN_ID + ".act.mixerScene.data.scene",
+                'type': "text",
+                'label': "Scene name",
+                "default": ""
+            },
+            'Duration': {
+                'id': PLUGIN_ID + ".act.mixerScene.data.duration",
+                'type': "text",
+                'label': "Crossfade (ms)",
+                "default": "0"
+            },
+            'Curve': {
+                'id': PLUGIN_ID + ".act.mixerScene.data.curve",
+                'type': "choice",
+                'label': "Fade curve",
+                'default': "Linear",
+                "valueChoices": [
+                    "Linear",
+                    "Ease In",
+                    "Ease Out",
+                    "S-Curve"
+                ]
+            },
+        }
+    },
+    'fadeAppVolume': {
+        'category': "main",
+        'id': PLUGIN_ID + ".act.fadeAppVolume",
+        'name': 'Fade App Volume',
+        'prefix': TP_PLUGIN_CATEGORIES['main']['name'],
+        'type': "communicate",
+        'tryInline': True,
+        'format': "Fade$[1]volume to$[2]% over$[3]ms$[4]",
+        "doc": "Gradually change an app's (or the master) volume. A new fade on the same app replaces the running one.",
+        'data': {
+            'AppChoice': {
+                'id': PLUGIN_ID + ".act.fadeAppVolume.data.process",
+                'type': "choice",
+                'label': "process list",
+                'default': "",
+                "valueChoices": []
+            },
+            'Volume': {
+                'id': PLUGIN_ID + ".act.fadeAppVolume.data.Volume",
+                'type': "text",
+                'label': "Volume",
+                "default": "0"
+            },
+            'Duration': {
+                'id': PLUGIN_ID + ".act.fadeAppVolume.data.duration",
+                'type': "text",
+                'label': "Duration (ms)",
+                "default": "1000"
+            },
+            'Curve': {
+                'id': PLUGIN_ID + ".act.fadeAppVolume.data.curve",
+                'type': "choice",
+                'label': "Fade curve",
+                'default': "Linear",
+                "valueChoices": [
+                    "Linear",
+                    "Ease In",
+                    "Ease Out",
+                    "S-Curve"
+                ]
+            },
+        }
+    },
+    'fadeDeviceVolume': {
+        'category': "main",
+        'id': PLUGIN_ID + ".act.fadeDeviceVolume",
+        'name': 'Fade Device Volume',
+        'prefix': TP_PLUGIN_CATEGORIES['main']['name'],
+        'type': "communicate",
+        'tryInline': True,
+        'format': "Fade$[1]device$[2]volume to$[3]% over$[4]ms$[5]",
+        "doc": "Gradually change a speaker or microphone volume. A new fade on the same device replaces the running one.",
+        'data': {
+            'deviceType': {
+                'id': PLUGIN_ID + ".act.fadeDeviceVolume.deviceType",
+                'type': "choice",
+                'label': "device type",
+                'default': "Pick One",
+                "valueChoices": [
+                    "Output",
+                    "Input"
+                ]
+            },
+            'deviceOption': {
+                'id': PLUGIN_ID + ".act.fadeDeviceVolume.devices",
+                'type': "choice",
+                'label': "Device choice list",
+                'default': "",
+                "valueChoices": []
+            },
+            'Volume': {
+                'id': PLUGIN_ID + ".act.fadeDeviceVolume.Volume",
+                'type': "text",
+                'label': "Volume",
+                "default": "0"
+            },
+            'Duration': {
+                'id': PLUGIN_ID + ".act.fadeDeviceVolume.duration",
+                'type': "text",
+                'label': "Duration (ms)",
+                "default": "1000"
+            },
+            'Curve': {
+                'id': PLUGIN_ID + ".act.fadeDeviceVolume.curve",
+                'type': "choice",
+                'label': "Fade curve",
+                'default': "Linear",
+                "valueChoices": [
+                    "Linear",
+                    "Ease In",
+                    "Ease Out",
+                    "S-Curve"
+                ]
+            },
+        }
     }
 }
 
@@ -393,5 +656,26 @@ TP_PLUGIN_STATES = {
         'type': "text",
         'desc': "Volume Mixer: Get Current Master volume",
         'default': ""
+    },
+    'mixerScene': {
+        'category': "main",
+        'id': PLUGIN_ID + ".state.mixerScene",
+        'type': "text",
+        'desc': "Volume Mixer: last restored scene",
+        'default': ""
+    },
+    'outputPeak': {
+        'category': "main",
+        'id': PLUGIN_ID + ".state.outputPeak",
+        'type': "text",
+        'desc': "Audio Device: default Output device peak",
+        'default': "0"
+    },
+    'inputPeak': {
+        'category': "main",
+        'id': PLUGIN_ID + ".state.inputPeak",
+        'type': "text",
+        'desc': "Audio Device: default Input device peak",
+        'default': "0"
     }
 }
\ No newline at end of file